@@ -0,0 +1,194 @@
+import argparse
+import io
+import math
+import sys
+import time
+import tracemalloc
+from xml.etree import ElementTree as ET
+
+import numpy as np
+
+from constructor import ConstructAssemblyFromFile, ConstructWingSection, ConstructHingePoints
+from interploate import AirfoilTable, interpSections
+from synthetic import GenerateSMX
+from writeAVl import writeAVL
+
+# ---------------------- Memory Benchmark ------------------------------- #
+# Footprint of the entities held by an Assembly, measured with tracemalloc
+# while constructing many of them from SMX elements.
+
+def MakeWingSectionElement(npoints=70):
+    t = np.linspace(0.0, 2.0 * np.pi, npoints)
+    pts = np.column_stack((0.5 + 0.5 * np.cos(t), 0.06 * np.sin(t)))
+
+    elem = ET.Element('WingSection', airfoil="NACA 0012", center=" 0 1 0 ", chord="1", dihedral="0",
+                      name="Section", twist="0", yaw="0")
+    elem.text = '\n'.join(f"{x:.6f} {y:.6f}" for x, y in pts)
+    return elem
+
+
+def MakeControlSrfElement(nhinges=3):
+    elem = ET.Element('ControlSrf', name="Aileron", type="TEF", wing="Wing")
+    for i in range(nhinges):
+        ET.SubElement(elem, 'Hingepoint', chordpos="0.75", spanpos=f"{i / nhinges:.3f}")
+    return elem
+
+
+def measure(construct, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [construct() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / count, items
+
+
+def memoryBenchmark(count=10000, npoints=70):
+    section = MakeWingSectionElement(npoints)
+    perSection, sections = measure(lambda: ConstructWingSection(section), count)
+    pointBytes = sections[0].points.nbytes
+
+    controlSrf = MakeControlSrfElement()
+    perHinge, _ = measure(lambda: ConstructHingePoints([controlSrf])[0], count)
+
+    print(f"WingSection ({npoints} points): {perSection:8.1f} bytes per section, "
+          f"{perSection - pointBytes:8.1f} bytes without coordinate data")
+    print(f"HingePoint:                   {perHinge:8.1f} bytes per hinge point")
+
+
+# ---------------------- Stage Benchmark -------------------------------- #
+# Times the conversion stages of a synthetic assembly separately: parsing,
+# addControlSys, airfoil interpolation on its own and writing the AVL file.
+# Every stage starts from a fresh parse, so the stages do not share caches.
+
+STAGES = ['parse', 'addControlSys', 'interpolate', 'write']
+
+
+def __interpolateAll__(assembly):
+    # one new section halfway between every pair of neighbouring sections
+    for wing in assembly.wingSkeletons:
+        secs = wing.wingSecs
+        positions = [0.5 * (r.center[1] + l.center[1]) for r, l in zip(secs[1:], secs[:-1])]
+        interpSections(secs[1:], secs[:-1], positions, AirfoilTable(secs))
+
+
+def __stages__(smxData):
+    # (stage, setup, run): run(setup()) is the part that is measured
+    parse = lambda: ConstructAssemblyFromFile(io.BytesIO(smxData))
+
+    def controlled():
+        assembly = parse()
+        assembly.addControlSys()
+        return assembly
+
+    return [('parse', lambda: None, lambda _: parse()),
+            ('addControlSys', parse, lambda assembly: assembly.addControlSys()),
+            ('interpolate', parse, __interpolateAll__),
+            ('write', controlled, lambda assembly: writeAVL(assembly, io.StringIO()))]
+
+
+def stageBenchmark(smxData, repeat=3, memory=True):
+    # stage -> {'seconds': best of repeat, 'peakBytes': tracemalloc peak}
+    results = dict()
+    for stage, setup, run in __stages__(smxData):
+        best = math.inf
+        for _ in range(repeat):
+            arg = setup()
+            start = time.perf_counter()
+            run(arg)
+            best = min(best, time.perf_counter() - start)
+        results[stage] = {'seconds': best}
+
+        if memory:
+            arg = setup()
+            tracemalloc.start()
+            run(arg)
+            results[stage]['peakBytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    return results
+
+
+def printStages(label, results):
+    print(f"{label}")
+    for stage in STAGES:
+        r = results[stage]
+        peak = f"{r['peakBytes'] / 2**20:9.2f} MB" if 'peakBytes' in r else ''
+        print(f"\t{stage:<16s}{r['seconds'] * 1e3:10.2f} ms{peak}")
+
+
+# ---------------------- Scaling Benchmark ------------------------------ #
+# Doubles one size knob of the synthetic assembly and reports the growth
+# exponent of every stage: about 1 is linear, 2 is quadratic.
+
+def scalingBenchmark(knob='nsecs', sizes=(25, 50, 100, 200), limit=1.5, repeat=3, **kwargs):
+    timings = list()
+    for size in sizes:
+        kwargs[knob] = size
+        results = stageBenchmark(GenerateSMX(**kwargs), repeat, memory=False)
+        timings.append(results)
+        printStages(f"{knob} = {size}", results)
+
+    slow = list()
+    print(f"growth exponents for {knob} {sizes[0]} -> {sizes[-1]} (limit {limit})")
+    for stage in STAGES:
+        t0 = timings[0][stage]['seconds']
+        t1 = timings[-1][stage]['seconds']
+        exponent = math.log(t1 / t0) / math.log(sizes[-1] / sizes[0])
+        flag = '' if exponent <= limit else '   *** superlinear ***'
+        print(f"\t{stage:<16s}{exponent:6.2f}{flag}")
+        if exponent > limit:
+            slow.append(stage)
+
+    return slow
+
+
+# ---------------------- Command Line ----------------------------------- #
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the SMX to AVL converter")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    memory = commands.add_parser('memory', help="footprint of wing sections and hinge points")
+    memory.add_argument('--count', type=int, default=10000)
+    memory.add_argument('--npoints', type=int, default=70)
+
+    knobs = argparse.ArgumentParser(add_help=False)
+    knobs.add_argument('--nwings', type=int, default=4)
+    knobs.add_argument('--nsecs', type=int, default=8, help="sections per wing")
+    knobs.add_argument('--npoints', type=int, default=70, help="points per airfoil")
+    knobs.add_argument('--nhinges', type=int, default=3, help="hinge points per wing")
+    knobs.add_argument('--npatterns', type=int, default=2, help="control patterns")
+    knobs.add_argument('--repeat', type=int, default=3)
+
+    stages = commands.add_parser('stages', parents=[knobs], help="time and memory of the conversion stages")
+    stages.add_argument('smx', nargs='?', help="SMX file to use instead of a synthetic assembly")
+
+    scaling = commands.add_parser('scaling', parents=[knobs], help="growth of the stage times with one knob")
+    scaling.add_argument('--knob', default='nsecs', choices=['nwings', 'nsecs', 'npoints', 'nhinges', 'npatterns'])
+    scaling.add_argument('--sizes', type=int, nargs='+', default=[25, 50, 100, 200])
+    scaling.add_argument('--limit', type=float, default=1.5, help="largest accepted growth exponent")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'memory':
+        memoryBenchmark(args.count, args.npoints)
+        return 0
+
+    kwargs = {knob: getattr(args, knob) for knob in ['nwings', 'nsecs', 'npoints', 'nhinges', 'npatterns']}
+
+    if args.command == 'stages':
+        if args.smx:
+            with open(args.smx, 'rb') as file:
+                smxData = file.read()
+        else:
+            smxData = GenerateSMX(**kwargs)
+        printStages(args.smx or f"synthetic {kwargs}", stageBenchmark(smxData, args.repeat))
+        return 0
+
+    kwargs.pop(args.knob)
+    slow = scalingBenchmark(args.knob, args.sizes, args.limit, args.repeat, **kwargs)
+    return 1 if slow else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import json
+import struct
+import zipfile
+
+import numpy as np
+
+from datastructure import *
+
+# ------------------- Binary Assembly Files ------------------------------ #
+# An Assembly in an uncompressed .npz container: the airfoil coordinates of
+# all sections in one (P, 2) array, the numbers of every section in one (S, 7)
+# array and the rest (names, flags, hinge points, control patterns, ctrlInfo)
+# as a JSON document. The coordinates are memory-mapped straight from the
+# file when it is loaded, every WingSection gets a read-only view of them.
+#
+#     points      (P, 2) float64   airfoil coordinates, section after section
+#     offsets     (S + 1,) int64   rows of every section in points
+#     sections    (S, 7) float64   chord, dihedral, twist, yaw, center x, y, z
+#     frames      (F, 4) float64   body frame center x, y, z, equivalent radius
+#     meta        (B,) uint8       JSON, see __meta__
+
+FORMAT_VERSION = 2
+
+
+def saveAssembly(assembly, file):
+    # file is a file name or a binary stream
+    secs = [sec for wing in assembly.wingSkeletons for sec in wing.wingSecs]
+    points = [np.asarray(sec.points, dtype=float).reshape(-1, 2) for sec in secs]
+
+    offsets = np.zeros(len(secs) + 1, dtype=np.int64)
+    np.cumsum([len(pts) for pts in points], out=offsets[1:])
+    values = np.array([[sec.chord, sec.dihedral, sec.twist, sec.yaw, *sec.center] for sec in secs],
+                      dtype=float).reshape(-1, 7)
+    frames = [np.column_stack((body.centers, body.radii)) for body in assembly.bodySkeletons]
+    meta = np.frombuffer(json.dumps(__meta__(assembly)).encode(), dtype=np.uint8)
+
+    arrays = dict(points=np.concatenate(points) if points else np.empty((0, 2)),
+                  offsets=offsets, sections=values,
+                  frames=np.concatenate(frames) if frames else np.empty((0, 4)), meta=meta)
+    if hasattr(file, 'write'):
+        np.savez(file, **arrays)
+    else:
+        with open(file, 'wb') as stream:
+            np.savez(stream, **arrays)
+
+
+def loadAssembly(file, mmap=True):
+    # file is a file name, or a binary stream (then nothing is memory-mapped)
+    with np.load(file) as npz:
+        offsets = npz['offsets']
+        values = npz['sections']
+        frames = npz['frames'] if 'frames' in npz else None
+        meta = json.loads(npz['meta'].tobytes())
+        points = __memmap__(file, 'points') if mmap and isinstance(file, str) else None
+        if points is None:
+            points = npz['points']
+
+    if meta['version'] != FORMAT_VERSION:
+        raise ValueError(f"unsupported assembly file version {meta['version']}")
+
+    assembly = Assembly()
+    s = 0
+    for wing in meta['wings']:
+        wingSecs = list()
+        for _ in range(wing['sections']):
+            chord, dihedral, twist, yaw, *center = values[s].tolist()
+            wingSecs.append(WingSection(airfoil=meta['airfoils'][s], name=meta['names'][s],
+                                        chord=chord, dihedral=dihedral, twist=twist, yaw=yaw,
+                                        center=center, points=points[offsets[s]:offsets[s + 1]]))
+            s += 1
+        assembly.wingSkeletons.append(WingSkeleton(flags=wing['flags'], name=wing['name'], origin=wing['origin'],
+                                                   rotate=wing['rotate'], wingSecs=wingSecs))
+
+    f = 0
+    for body in meta['bodies']:
+        n = body['frames']
+        assembly.bodySkeletons.append(BodySkeleton(name=body['name'], origin=body['origin'], rotate=body['rotate'],
+                                                   centers=frames[f:f + n, :3], radii=frames[f:f + n, 3]))
+        f += n
+
+    assembly.hingePoints = [HingePoint(*hp) for hp in meta['hingePoints']]
+    assembly.controlPatterns = [ControlPattern(*part) for part in meta['controlPatterns']]
+    assembly.ctrlInfo = {key: [Info(*info) for info in infos] for key, infos in meta['ctrlInfo'].items()}
+    return assembly
+
+
+def __meta__(assembly):
+    secs = [sec for wing in assembly.wingSkeletons for sec in wing.wingSecs]
+    return {'version': FORMAT_VERSION,
+            'wings': [{'flags': wing.flags, 'name': wing.name, 'origin': list(wing.origin),
+                       'rotate': list(wing.rotate), 'sections': len(wing.wingSecs)}
+                      for wing in assembly.wingSkeletons],
+            'bodies': [{'name': body.name, 'origin': list(body.origin), 'rotate': list(body.rotate),
+                        'frames': len(body.radii)} for body in assembly.bodySkeletons],
+            'airfoils': [sec.airfoil for sec in secs],
+            'names': [sec.name for sec in secs],
+            'hingePoints': [[hp.name, hp.type, hp.wing, hp.spanpos, hp.chordpos, hp.section]
+                            for hp in assembly.hingePoints],
+            'controlPatterns': [[part.name, part.factor, part.idname, part.idnum, part.hinge1, part.hinge2]
+                                for part in assembly.controlPatterns],
+            'ctrlInfo': {key: [[info.name, info.Xhinge, info.SgnDup] for info in infos]
+                         for key, infos in assembly.ctrlInfo.items()}}
+
+
+def __memmap__(path, name):
+    # read-only memmap of an array stored uncompressed in the .npz file at path,
+    # None if it cannot be mapped (compressed member, empty array)
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo(name + '.npy')
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(path, 'rb') as file:
+        # the member data follows its local header and the .npy header
+        file.seek(info.header_offset)
+        nameLength, extraLength = struct.unpack('<HH', file.read(30)[26:30])
+        file.seek(info.header_offset + 30 + nameLength + extraLength)
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+
+    if dtype.hasobject or np.prod(shape) == 0:
+        return None
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran else 'C')
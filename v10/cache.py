@@ -0,0 +1,132 @@
+import hashlib
+import os
+import tempfile
+
+# ------------------- Conversion Cache ----------------------------------- #
+# On-disk cache of converted AVL files, addressed by a hash of the SMX content
+# and the conversion parameters. Entries are evicted least recently used
+# first (by modification time, which is refreshed on every hit) once the
+# cache grows beyond maxBytes, down to LOW_WATER of it, so that the directory
+# is only scanned again after many more entries. Next to the AVL files the
+# cache keeps the assemblies built from the SMX files (see binary.py), which
+# do not depend on the parameters, so that other parameters skip the parsing.
+
+CACHE_VERSION = 4       # bump when the converter output changes for the same input
+LOW_WATER = 0.9         # share of maxBytes that is kept after an eviction
+
+
+class ConversionCache:
+    def __init__(self, directory, maxBytes=256 * 2**20):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        # running total of the entry sizes; other processes sharing the directory
+        # are only accounted for when it is scanned again for an eviction
+        self.size = sum(entry[1] for entry in self.entries())
+
+    def key(self, smxData, params):
+        digest = hashlib.sha256(f"sumo2avl-{CACHE_VERSION}\n{params!r}\n".encode())
+        digest.update(smxData)
+        return digest.hexdigest()
+
+    def assemblyKey(self, smxData, engine='fast', bodies=False):
+        # the assembly holds the interpolated control sections, so it depends on the
+        # converter version and on the engine that inserted them; the bodies are
+        # only read when they are written
+        from binary import FORMAT_VERSION
+        variant = ('' if engine == 'fast' else f"-{engine}") + ('-bodies' if bodies else '')
+        digest = hashlib.sha256(f"sumo2avl-assembly-{CACHE_VERSION}-{FORMAT_VERSION}{variant}\n".encode())
+        digest.update(smxData)
+        return digest.hexdigest()
+
+    def path(self, key, suffix='.avl'):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path) as file:
+                text = file.read()
+            os.utime(path)
+        except FileNotFoundError:       # also when evicted by another process meanwhile
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return text
+
+    def put(self, key, text):
+        # written to a temporary file first, so that readers never see partial entries
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            file.write(text)
+        self.replace(tmp, self.path(key))
+
+    def getAssembly(self, key):
+        # the airfoil coordinates stay memory-mapped, which outlives an eviction
+        from binary import loadAssembly
+        path = self.path(key, '.npz')
+        try:
+            assembly = loadAssembly(path)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):     # evicted meanwhile, or of another format version
+            return None
+        return assembly
+
+    def putAssembly(self, key, assembly):
+        from binary import saveAssembly
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            saveAssembly(assembly, file)
+        self.replace(tmp, self.path(key, '.npz'))
+
+    def replace(self, tmp, path):
+        # moves a written entry into place and evicts if the cache is full now
+        try:
+            self.size -= os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+        self.size += os.path.getsize(tmp)
+        os.replace(tmp, path)
+
+        if self.size > self.maxBytes:
+            self.evict()
+
+    def entries(self):
+        entries = list()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(('.avl', '.npz')):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        if size <= self.maxBytes:
+            self.size = size
+            return
+
+        for mtime, nbytes, path in sorted(entries):
+            if size <= self.maxBytes * LOW_WATER:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            size -= nbytes
+        self.size = size
+
+    def stats(self):
+        entries = self.entries()
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(entries), 'bytes': sum(entry[1] for entry in entries)}
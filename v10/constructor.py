@@ -1,48 +1,173 @@
+import numpy as np
+from xml.etree import ElementTree as ET
 from datastructure import *
+from rotation import equivalentRadii
+import instrument
 
 # ---------------- Constructor Functions ------------------------- #
-def ConstructAssemblyFromXML(root):
+def ConstructAssemblyFromXML(root, bodies=False):
+    # bodies: also build the BodySkeletons, which are only needed for BODY output
     assembly = Assembly()
 
-    assembly.wingSkeletons = [ConstructWingSkeleton(item) for item in root.findall('WingSkeleton')]
-    assembly.hingePoints, assembly.controlPatterns = ConstructControlSystem(root.find('ControlSystem'))
+    with instrument.stage('parse'):
+        assembly.wingSkeletons = [ConstructWingSkeleton(item) for item in root.findall('WingSkeleton')]
+        if bodies:
+            assembly.bodySkeletons = [ConstructBodySkeleton(item) for item in root.findall('BodySkeleton')]
+        controlSys = root.find('ControlSystem')
+        if controlSys is not None:
+            assembly.hingePoints, assembly.controlPatterns = ConstructControlSystem(controlSys)
 
     return assembly
 
-def ConstructWingSkeleton(wingSkeleton):
-    wing = WingSkeleton()
 
-    wing.flags = wingSkeleton.attrib['flags']
-    wing.name = wingSkeleton.attrib['name']
-    wing.origin = [float(x) for x in wingSkeleton.attrib['origin'].strip().split()]
-    wing.rotate = [float(x) for x in wingSkeleton.attrib['rotation'].strip().split()]
-    wing.wingSecs = [ConstructWingSection(item) for item in wingSkeleton.findall('WingSection')]
+def ConstructAssemblyFromFile(source, bodies=False):
+    # incremental counterpart of ConstructAssemblyFromXML: wing sections and body
+    # frames are built as soon as their element is closed and the element is
+    # released again; without bodies the body elements are only released
+    with instrument.stage('parse'):
+        return __constructAssemblyFromFile__(source, bodies)
 
-    return wing
 
+def __constructAssemblyFromFile__(source, bodies=False):
+    assembly = Assembly()
+    wingSecs = list()
+    frames = BodyFrames()
+    bodyDepth = 0
+
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'BodySkeleton':
+                bodyDepth += 1
+            continue
+
+        if bodyDepth:
+            if bodies and elem.tag == 'BodyFrame':
+                frames.append(elem)
+            elif elem.tag == 'BodySkeleton':
+                bodyDepth -= 1
+                if bodies:
+                    assembly.bodySkeletons.append(ConstructBodySkeleton(elem, frames))
+                    instrument.count('frames', len(frames))
+                    frames = BodyFrames()
+            elem.clear()
+        elif elem.tag == 'WingSection':
+            wingSecs.append(ConstructWingSection(elem))
+            elem.clear()
+        elif elem.tag == 'WingSkeleton':
+            assembly.wingSkeletons.append(ConstructWingSkeleton(elem, wingSecs))
+            instrument.count('sections', len(wingSecs), wing=elem.attrib['name'])
+            instrument.count('points', sum(len(sec.points) for sec in wingSecs), wing=elem.attrib['name'])
+            wingSecs = list()
+            elem.clear()
+        elif elem.tag == 'ControlSystem':
+            assembly.hingePoints, assembly.controlPatterns = ConstructControlSystem(elem)
+            instrument.count('hingePoints', len(assembly.hingePoints))
+            instrument.count('controlPatterns', len(assembly.controlPatterns))
+            elem.clear()
 
-def ConstructWingSection(wingSection):
-    section = WingSection()
+    return assembly
 
-    section.airfoil = wingSection.attrib['airfoil']
-    section.name = wingSection.attrib['name']
-    section.chord = float(wingSection.attrib['chord'])
-    section.dihedral = float(wingSection.attrib['dihedral'])
-    section.twist = float(wingSection.attrib['twist'])
-    section.yaw = float(wingSection.attrib['yaw'])
-    section.center = [float(x) for x in wingSection.attrib['center'].strip().split()]
-    section.points = [float(x) for x in wingSection.text.strip().split()]
 
-    return section
+def ConstructWingSkeleton(wingSkeleton, wingSecs=None):
+    if wingSecs is None:
+        wingSecs = [ConstructWingSection(item) for item in wingSkeleton.findall('WingSection')]
+
+    return WingSkeleton(flags=wingSkeleton.attrib['flags'],
+                        name=wingSkeleton.attrib['name'],
+                        origin=[float(x) for x in wingSkeleton.attrib['origin'].strip().split()],
+                        rotate=[float(x) for x in wingSkeleton.attrib['rotation'].strip().split()],
+                        wingSecs=wingSecs)
+
+
+def ConstructBodySkeleton(bodySkeleton, frames=None):
+    if frames is None:
+        frames = BodyFrames()
+        for item in bodySkeleton.findall('BodyFrame'):
+            frames.append(item)
+    centers, radii = frames.result()
+
+    return BodySkeleton(name=bodySkeleton.attrib['name'],
+                        origin=[float(x) for x in bodySkeleton.attrib['origin'].strip().split()],
+                        rotate=[float(x) for x in bodySkeleton.attrib['rotation'].strip().split()],
+                        centers=centers,
+                        radii=radii)
+
+
+class BodyFrames:
+    # Frames of a BodySkeleton while it is read. Frames are only kept as read
+    # until CHUNK of them are pending, then the equivalent radii of the chunk are
+    # computed in one batch and the contours are dropped, so a frame ends up as
+    # four numbers.
+    CHUNK = 256
+
+    def __init__(self):
+        self.chunks = list()        # (centers, radii) arrays of the finished chunks
+        self.count = 0
+        self.centers = list()       # pending frames: center, contour, width * height / 4, symmetric
+        self.contours = list()
+        self.scales = list()
+        self.symmetric = list()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, bodyFrame):
+        text = bodyFrame.text or ''
+        self.centers.append([float(x) for x in bodyFrame.attrib['center'].strip().split()])
+        self.contours.append(np.fromstring(text, sep=' ').reshape(-1, 2) if text.strip() else np.empty((0, 2)))
+        self.scales.append(0.25 * float(bodyFrame.attrib['width']) * float(bodyFrame.attrib['height']))
+        self.symmetric.append(bodyFrame.attrib.get('symmetric', 'true') == 'true')
+        self.count += 1
+
+        if len(self.contours) >= self.CHUNK:
+            self.flush()
+
+    def flush(self):
+        if self.contours:
+            self.chunks.append((np.array(self.centers, dtype=float).reshape(-1, 3),
+                                equivalentRadii(self.contours, self.scales, self.symmetric)))
+            self.centers, self.contours, self.scales, self.symmetric = list(), list(), list(), list()
+
+    def result(self):
+        # (F, 3) centers and (F,) equivalent radii
+        self.flush()
+        if not self.chunks:
+            return np.empty((0, 3)), np.empty(0)
+        return np.concatenate([c for c, r in self.chunks]), np.concatenate([r for c, r in self.chunks])
+
+
+def ConstructWingSection(wingSection):
+    text = wingSection.text or ''
+    values = np.fromstring(text, sep=' ') if text.strip() else np.empty(0)
+    if values.size % 2:
+        raise ValueError(f"WingSection '{wingSection.attrib.get('name', '')}' has an odd number of "
+                         f"airfoil coordinates ({values.size})")
+
+    return WingSection(airfoil=wingSection.attrib['airfoil'],
+                       name=wingSection.attrib['name'],
+                       chord=float(wingSection.attrib['chord']),
+                       dihedral=float(wingSection.attrib['dihedral']),
+                       twist=float(wingSection.attrib['twist']),
+                       yaw=float(wingSection.attrib['yaw']),
+                       center=[float(x) for x in wingSection.attrib['center'].strip().split()],
+                       points=values.reshape(-1, 2))
 
 def ConstructControlSystem(controlSys):
 
     hingePoints = ConstructHingePoints(controlSys.findall('ControlSrf'))
     ctrlPatterns = [ConstructControlPattern(item) for item in controlSys.findall('Control')]
+    ctrlSrfIndex = IndexHingePoints(hingePoints)
 
     for ctrlPattern in ctrlPatterns:
         for idname,idnum in zip(ctrlPattern.idname,ctrlPattern.idnum):
-            id_hp = [id for id,hp in enumerate(hingePoints) if hp.name == idname]
+            if idname not in ctrlSrfIndex:
+                raise ValueError(f"Control '{ctrlPattern.name}' refers to unknown control surface '{idname}'")
+
+            id_hp = ctrlSrfIndex[idname]
+            if not 0 <= idnum < len(id_hp) - 1:
+                raise ValueError(f"Control '{ctrlPattern.name}' refers to segment {idnum} of control surface "
+                                 f"'{idname}', which has {len(id_hp) - 1} segment(s)")
+
             ctrlPattern.hinge1.append(id_hp[idnum])
             ctrlPattern.hinge2.append(id_hp[idnum+1])
 
@@ -50,23 +175,23 @@ def ConstructControlSystem(controlSys):
 
 
 def ConstructControlPattern(control):
-    ctrlPattern = ControlPattern()
-
-    ctrlPattern.name = control.attrib['name']
+    factors = list()
+    idnames = list()
+    idnums = list()
 
     for item in control.findall('Participation'):
         factor = float(item.attrib['factor'])
         id = item.attrib['id'].split('Segment')
 
-        ctrlPattern.factor.append(factor)
-        ctrlPattern.idname.append(id[0])
+        factors.append(factor)
+        idnames.append(id[0])
 
         if len(id) > 1:
-            ctrlPattern.idnum.append(int(id[1]))
+            idnums.append(int(id[1]))
         else:
-            ctrlPattern.idnum.append(int(0))
+            idnums.append(int(0))
 
-    return ctrlPattern
+    return ControlPattern(name=control.attrib['name'], factor=factors, idname=idnames, idnum=idnums)
 
 
 def ConstructHingePoints(controlSurf):
@@ -74,12 +199,11 @@ def ConstructHingePoints(controlSurf):
 
     for surf in controlSurf:
         for hinge in surf.findall('Hingepoint'):
-            hp = HingePoint()
-            hp.name = surf.attrib['name']
-            hp.wing = surf.attrib['wing']
-            hp.type = surf.attrib['type']
-            hp.chordpos = float(hinge.attrib['chordpos'])
-            hp.spanpos = float(hinge.attrib['spanpos'])
+            hp = HingePoint(name=surf.attrib['name'],
+                            type=surf.attrib['type'],
+                            wing=surf.attrib['wing'],
+                            spanpos=float(hinge.attrib['spanpos']),
+                            chordpos=float(hinge.attrib['chordpos']))
 
             hingePoints.append(hp)
 
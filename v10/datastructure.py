@@ -1,23 +1,90 @@
-import matplotlib.pyplot as plt
+import numpy as np
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from rotation import GetTransform
+import instrument
+
+# severities of validation issues, see Assembly::validate
+ERROR = 'error'
+WARNING = 'warning'
 
 # ----------------- Class Definitions ----------------------------------#
 # --------- WingSkeletion -------------------#
 class Assembly:
     def __init__(self):
         self.wingSkeletons = list()     # list of WingSkeleton ('WingSkeletion')
+        self.bodySkeletons = list()     # list of BodySkeleton ('BodySkeleton')
         self.controlPatterns = list()   # list of ControlPattern ('Control')
         self.hingePoints = list()       # list of HingePoints ('ControlSrf')
         self.ctrlInfo = dict()         # mapping the control system to sections
+        self._wingIndex = None          # (wing name -> WingSkeleton, number of wings)
+        self._ctrlSrfIndex = None       # (control surface name -> ordered hinge ids, number of hinges)
+        self._geometry = None           # (Geometry, state of the wings it was computed for)
+
+    @property
+    def wingIndex(self):
+        if self._wingIndex is None or self._wingIndex[1] != len(self.wingSkeletons):
+            self._wingIndex = (IndexByName(self.wingSkeletons), len(self.wingSkeletons))
+        return self._wingIndex[0]
+
+    @property
+    def ctrlSrfIndex(self):
+        if self._ctrlSrfIndex is None or self._ctrlSrfIndex[1] != len(self.hingePoints):
+            self._ctrlSrfIndex = (IndexHingePoints(self.hingePoints), len(self.hingePoints))
+        return self._ctrlSrfIndex[0]
+
+    def GetWing(self, name):
+        if name not in self.wingIndex:
+            raise ValueError(f"no WingSkeleton named '{name}' in the assembly")
+        return self.wingIndex[name]
+
+    def GetHingeIds(self, name):
+        if name not in self.ctrlSrfIndex:
+            raise ValueError(f"no control surface (ControlSrf) named '{name}' in the assembly")
+        return self.ctrlSrfIndex[name]
+
+    def geometry(self):
+        # leading edges, trailing edges and hinge points of all wings, transformed in one pass;
+        # recomputed when sections are inserted or a wing is moved
+        state = [(len(wing.wingSecs), tuple(wing.rotate), tuple(wing.origin)) for wing in self.wingSkeletons]
+        state.append([hp.section for hp in self.hingePoints])
+        if self._geometry is None or self._geometry[1] != state:
+            with instrument.stage('rotate'):
+                self._geometry = (__geometry__(self), state)
+        return self._geometry[0]
 
     def plot(self):
-        __plot__(self)
+        from plot import plotAssembly
+        plotAssembly(self)
 
-        plt.show()
+    def validate(self, level=WARNING):
+        # list of Issue, without any output; level=ERROR skips the warnings
+        issues = list()
+        names = set()
+        for wing in self.wingSkeletons:
+            if wing.name in names:
+                issues.append(Issue(ERROR, 'wing-duplicate', "duplicated wing name", wing.name))
+            names.add(wing.name)
+            issues += wing.validate(level)
+        for body in self.bodySkeletons:
+            issues += body.validate(level)
+        for pattern in self.controlPatterns:
+            issues += pattern.validate(level)
+        for hinge in self.hingePoints:
+            issues += hinge.validate(level, self.wingIndex)
+        return issues
+
+    def check(self, issues=None):
+        # prints the assembly with the issues found by validate
+        if issues is None:
+            issues = self.validate()
+        marks = dict()
+        for issue in issues:
+            marks.setdefault((issue.wing, issue.section), []).append(f"*** {issue.message} ***")
 
-    def check(self):
         print("Checking WingSkeletons ...")
         for wing in self.wingSkeletons:
-            wing.check()
+            wing.check(marks)
         print("Checking Control Patterns ...")
         for pattern in self.controlPatterns:
             pattern.check()
@@ -25,96 +92,237 @@ class Assembly:
         for id, hinge in enumerate(self.hingePoints):
             print(f"\t{id}", end='')
             hinge.check()
+        for issue in issues:
+            if issue.wing is None or issue.wing not in self.wingIndex:
+                print(f"\t*** {issue} ***")
         print("Checking Control Info ...")
         for key in self.ctrlInfo:
             print("\t" + key + f"\t{[info.name for info in self.ctrlInfo[key]]}")
         print("Checking Finished ...........\n")
 
-    def addControlSys(self):
-        __addControlSys__(self)
+    def addControlSys(self, wings=None, engine='fast'):
+        # wings: the WingSkeletons to process, all of them by default;
+        # engine: 'reference' interpolates the control sections as reference.py
+        __addControlSys__(self, wings, engine)
 
 # --------- WingSkeletion -------------------#
+@dataclass(slots=True, eq=False)
 class WingSkeleton:
-    def __init__(self):
-        self.flags = ""
-        self.name = ""
-        self.origin = None
-        self.rotate = None
-        self.wingSecs = None
+    flags: str
+    name: str
+    origin: list                    # [x, y, z]
+    rotate: list                    # rotation vector [rx, ry, rz] in radians
+    wingSecs: list                  # list of WingSection, from tip to root
+    _spanIndex: object = field(default=None, init=False, repr=False, compare=False)    # SpanIndex of wingSecs, built on first use
+    _secIndex: tuple = field(default=None, init=False, repr=False, compare=False)      # (section name -> WingSection, number of sections)
+    _airfoilTable: object = field(default=None, init=False, repr=False, compare=False) # AirfoilTable of the parent sections
 
     # .............................
-    def check(self):
-        print(f"\t{self.name:<16s}", end='')
-        if self.rotate[2] != 0.0:
-            print("*** non-zero yaw ***", end='')
-        if self.rotate[0] != 0.0 and self.rotate[1] != 0.0:
-            print("*** non-zero roll and pitch ***", end='')
-        print("")
+    def validate(self, level=WARNING):
+        issues = list()
+        if level == WARNING:
+            if self.rotate[2] != 0.0:
+                issues.append(Issue(WARNING, 'wing-yaw', "non-zero yaw", self.name))
+            if self.rotate[0] != 0.0 and self.rotate[1] != 0.0:
+                issues.append(Issue(WARNING, 'wing-roll-pitch', "non-zero roll and pitch", self.name))
+        if not self.wingSecs:
+            issues.append(Issue(ERROR, 'wing-empty', "no wing sections", self.name))
+        elif len(self.wingSecs) > 1 and self.spanIndex.max == self.spanIndex.min:
+            issues.append(Issue(ERROR, 'wing-span', "zero span", self.name))
+
+        names = set()
+        for section in self.wingSecs:
+            if section.name in names and level == WARNING:
+                issues.append(Issue(WARNING, 'section-duplicate', "duplicated section name", self.name, section.name))
+            names.add(section.name)
+            issues += section.validate(level, self.name)
+        return issues
+
+    def check(self, marks=None):
+        # marks: (wing, section) -> messages, see Assembly::check
+        if marks is None:
+            marks = dict()
+            for issue in self.validate():
+                marks.setdefault((issue.wing, issue.section), []).append(f"*** {issue.message} ***")
+
+        print(f"\t{self.name:<16s}" + ''.join(marks.get((self.name, None), [])))
         for section in self.wingSecs:
-            section.check()
+            print(f"\t\t{section.name:<24s}" + ''.join(marks.get((self.name, section.name), [])))
 
     def plot(self):
-        __WingSkeleton_plot__(self)
+        from plot import plotWingSkeleton
+        plotWingSkeleton(self)
+
+    @property
+    def spanIndex(self):
+        if self._spanIndex is None or len(self._spanIndex) != len(self.wingSecs):
+            self._spanIndex = SpanIndex([sec.center[1] for sec in self.wingSecs])
+        return self._spanIndex
+
+    @property
+    def airfoilTable(self):
+        if self._airfoilTable is None:
+            from interploate import AirfoilTable
+            self._airfoilTable = AirfoilTable(self.wingSecs)
+        return self._airfoilTable
+
+    @property
+    def secIndex(self):
+        if self._secIndex is None or self._secIndex[1] != len(self.wingSecs):
+            self._secIndex = (IndexByName(self.wingSecs), len(self.wingSecs))
+        return self._secIndex[0]
+
+    def GetWingSec(self, name):
+        if name not in self.secIndex:
+            raise ValueError(f"no WingSection named '{name}' in WingSkeleton '{self.name}'")
+        return self.secIndex[name]
+
+    @property
+    def transform(self):
+        # memoized on the values of rotate and origin
+        return GetTransform(tuple(self.rotate), tuple(self.origin))
 
     # ...............................
-    def addCtrlSections(self, ctrlSpanPos):
-        __addCtrlSections__(self, ctrlSpanPos)
+    def addCtrlSections(self, ctrlSpanPos, engine='fast'):
+        __addCtrlSections__(self, ctrlSpanPos, engine)
 
     def GetWingSecName(self, spanpos):
         id = self.GetWingSecId(spanpos)
         return self.wingSecs[id].name if id is not None else ""
 
     def GetWingSecId(self, spanpos):
-        LE_y = [sec.center[1] for sec in self.wingSecs]
+        index = self.spanIndex
 
-        maxPos = max(LE_y)
-        minPos = min(LE_y)
+        maxPos = index.max
+        minPos = index.min
         SPAN = maxPos - minPos
 
         fac = 2 if "autosym" in self.flags else 1
         pos = maxPos - fac * spanpos * SPAN
 
-        id = __findIndex__(LE_y, pos)[0]
+        id = index.find(pos)[0]
 
         return id
 
 
+# --------- BodySkeleton -------------------#
+@dataclass(slots=True, eq=False)
+class BodySkeleton:
+    name: str
+    origin: list                    # [x, y, z]
+    rotate: list                    # rotation vector [rx, ry, rz] in radians
+    centers: np.ndarray             # (F, 3) frame centers, from the nose to the tail
+    radii: np.ndarray               # (F,) radii of the circles with the areas of the frames
+
+    def validate(self, level=WARNING):
+        issues = list()
+        if len(self.radii) < 2:
+            issues.append(Issue(ERROR, 'body-frames', "fewer than two body frames", self.name))
+        elif level == WARNING and np.any(np.diff(self.centers[:, 0]) < 0.0):
+            issues.append(Issue(WARNING, 'body-order', "body frames not ordered from nose to tail", self.name))
+        return issues
+
+    @property
+    def transform(self):
+        return GetTransform(tuple(self.rotate), tuple(self.origin))
+
+
+# --------- SpanIndex -------------------#
+class SpanIndex:
+    # Leading-edge y positions of the wing sections, which run from the tip
+    # (largest y) to the root. They are stored negated in ascending order, so
+    # that lookups and insertions can bisect.
+    def __init__(self, LE_y):
+        self.keys = [-pos for pos in LE_y]
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def max(self):
+        return -self.keys[0]
+
+    @property
+    def min(self):
+        return -self.keys[-1]
+
+    def find(self, newpos):
+        # (id1, id2) of the sections enclosing newpos: id1 == id2 if newpos coincides
+        # with a section, (None, None) if newpos is outside the wing
+        if newpos > self.max or newpos < self.min:
+            return None, None
+
+        id1 = bisect_left(self.keys, -newpos)       # first section with pos <= newpos
+
+        if abs(self.keys[id1] + newpos) < 0.001:    # wingroot - id1 = pos/newpos = id2 - wingtip
+            id2 = id1
+        else:                                       # wingroot - id1 < pos < id2 - wingtip
+            id2 = id1 - 1 if id1 >= 1 else id1
+
+        return id1, id2
+
+    def insert(self, id, pos):
+        self.keys.insert(id, -pos)
+
+
 # --------- WingSection -------------------#
+@dataclass(slots=True, eq=False)
 class WingSection:
-    def __init__(self):
-        self.airfoil = ""
-        self.name = ""
-        self.chord = None
-        self.dihedral = None
-        self.twist = None
-        self.yaw = None
-        self.center = None
-        self.points = None
+    airfoil: str
+    name: str
+    chord: float
+    dihedral: float
+    twist: float
+    yaw: float
+    center: list                    # leading edge [x, y, z]
+    points: np.ndarray              # (N, 2) array of airfoil coordinates
 
     # .................................
+    def validate(self, level=WARNING, wing=None):
+        issues = list()
+        if self.points.ndim != 2 or self.points.shape[-1] != 2 or len(self.points) < 3:
+            issues.append(Issue(ERROR, 'airfoil-shape', "incorrect airfoil coordinates", wing, self.name))
+        elif self.points[:, 0].max() == self.points[:, 0].min():
+            issues.append(Issue(ERROR, 'airfoil-shape', "airfoil without chordwise extent", wing, self.name))
+        if not self.chord > 0.0:
+            issues.append(Issue(ERROR, 'section-chord', "non-positive chord", wing, self.name))
+
+        if level == WARNING:
+            if self.yaw != 0.0:
+                issues.append(Issue(WARNING, 'section-yaw', "non-zero z-rotation", wing, self.name))
+        return issues
+
     def check(self):
-        print(f"\t\t{self.name:<24s}", end='')
-        if self.yaw != 0.0:
-            print("*** non-zero z-rotation ***", end='')
-        if len(self.points) % 2 != 0 or len(self.points) >= 600:
-            print("*** incorrect number of airfoil points ****", end='')
-        print("")
+        print(f"\t\t{self.name:<24s}" + ''.join(f"*** {issue.message} ***" for issue in self.validate()))
 
     def plot(self):
-        style = '--' if 'interp' in self.name else '-'
-        plt.plot(self.points[0::2], self.points[1::2], style, label=self.name)
+        from plot import plotWingSection
+        plotWingSection(self)
+
+
+# --------- Geometry -------------------#
+@dataclass(slots=True, eq=False)
+class Geometry:
+    le: list                        # per wing, (N, 3) rotated leading edges (wing frame, as written to AVL)
+    leWorld: list                   # per wing, (N, 3) leading edges in the assembly frame
+    teWorld: list                   # per wing, (N, 3) trailing edges in the assembly frame
+    hinges: np.ndarray              # (H, 3) hinge points in the assembly frame, nan if not on a section
 
 
 #-------------------- ControlPattern Class ---------------------------#
+@dataclass(slots=True, eq=False)
 class ControlPattern:
-    def __init__(self):
-        self.name = ""
-        self.factor = list()
-        self.idname = list()
-        self.idnum = list()
-        self.hinge1 = list()        # list of left hinge id in Assembly::hingePoints list
-        self.hinge2 = list()        # list of right hinge id in Assembly::hingePoints list
-
+    name: str
+    factor: list
+    idname: list
+    idnum: list
+    hinge1: list = field(default_factory=list)     # list of left hinge id in Assembly::hingePoints list
+    hinge2: list = field(default_factory=list)     # list of right hinge id in Assembly::hingePoints list
+
+    def validate(self, level=WARNING):
+        if not self.idname and level == WARNING:
+            return [Issue(WARNING, 'control-empty', f"control '{self.name}' has no participations")]
+        return []
 
     def check(self):
         print(f"\t{self.name}")
@@ -123,47 +331,141 @@ class ControlPattern:
 
 
 # ---------------------- HingePoints Class ----------------------------#
+@dataclass(slots=True, eq=False)
 class HingePoint:
-    def __init__(self):
-        self.name = ""
-        self.type = ""
-        self.wing = ""
-        self.spanpos = None
-        self.chordpos = None
-        self.section = None
+    name: str                       # name of the control surface ('ControlSrf')
+    type: str
+    wing: str
+    spanpos: float
+    chordpos: float
+    section: str = None             # name of the wing section, set by Assembly::addControlSys
+
+    def validate(self, level=WARNING, wingIndex=None):
+        # wingIndex: wing name -> WingSkeleton of the assembly, to find hinge points on unknown wings
+        if wingIndex is not None and self.wing not in wingIndex:
+            return [Issue(ERROR, 'hinge-wing', f"control surface '{self.name}' on unknown wing", self.wing)]
+        if not 0.0 <= self.spanpos <= 1.0 and level == WARNING:
+            return [Issue(WARNING, 'hinge-spanpos', f"control surface '{self.name}' outside the wing", self.wing)]
+        return []
 
     def check(self):
         print(f"\t{self.name} type = {self.type} wing = {self.wing} sec = {self.section} span = {self.spanpos}, chord = {self.chordpos}")
 
 
+@dataclass(slots=True, eq=False)
 class Info:
-    def __init__(self):
-        self.name = ""
-        self.Xhinge = None
-        self.SgnDup = None
+    name: str
+    Xhinge: float
+    SgnDup: int
 
 
-# ------------------------- Functions ---------------------------------- #
-def __addControlSys__(self):
+# ---------------------- Validation Issue -----------------------------#
+@dataclass(slots=True)
+class Issue:
+    severity: str                   # ERROR or WARNING
+    code: str                       # e.g. 'section-yaw', stable for scripts
+    message: str
+    wing: str = None
+    section: str = None
 
-    for wing in self.wingSkeletons:
-        ctrlSpanPos = [hp.spanpos for hp in self.hingePoints if hp.wing == wing.name]
-        if ctrlSpanPos:
-            wing.addCtrlSections(ctrlSpanPos)
+    def __str__(self):
+        where = '/'.join(name for name in (self.wing, self.section) if name)
+        return f"{self.severity}: {self.code}: {self.message}" + (f" ({where})" if where else '')
 
+
+class ValidationError(ValueError):
+    def __init__(self, issues):
+        super().__init__('; '.join(str(issue) for issue in issues))
+        self.issues = issues
+
+
+# ------------------------- Functions ---------------------------------- #
+def IndexByName(items):
+    # name -> item, the first item wins for duplicated names
+    index = dict()
+    for item in items:
+        index.setdefault(item.name, item)
+    return index
+
+
+def IndexHingePoints(hingePoints):
+    # control surface name -> ids of its hinge points in hingePoints, in order
+    index = dict()
+    for id, hp in enumerate(hingePoints):
+        index.setdefault(hp.name, []).append(id)
+    return index
+
+
+def __geometry__(self):
+    wings = self.wingSkeletons
+    counts = [len(wing.wingSecs) for wing in wings]
+    position = {wing: i for i, wing in enumerate(wings)}
+
+    le = np.array([sec.center for wing in wings for sec in wing.wingSecs], dtype=float).reshape(-1, 3)
+    te = le.copy()
+    te[:, 0] += [sec.chord for wing in wings for sec in wing.wingSecs]
+
+    # hinge points sit at chordpos on the section they were mapped to by addControlSys
+    hinges = np.full((len(self.hingePoints), 3), np.nan)
+    hingeWing = np.zeros(len(self.hingePoints), dtype=int)
+    for hinge, hp in enumerate(self.hingePoints):
+        if hp.section and hp.wing in self.wingIndex:
+            wing = self.GetWing(hp.wing)
+            sec = wing.GetWingSec(hp.section)
+            hinges[hinge] = sec.center
+            hinges[hinge, 0] += hp.chordpos * sec.chord
+            hingeWing[hinge] = position[wing]
+
+    transforms = [wing.transform for wing in wings]
+    matrix = np.array([t.matrix for t in transforms]).reshape(-1, 3, 3)
+    origin = np.array([t.origin for t in transforms]).reshape(-1, 3)
+    identity = np.array([t.identity for t in transforms], dtype=bool)
+
+    secWing = np.repeat(np.arange(len(wings)), counts)
+    ids = np.concatenate((secWing, secWing, hingeWing))
+    pts = np.concatenate((le, te, hinges))
+
+    rotated = np.einsum('nij,nj->ni', matrix[ids], pts)
+    rotated[identity[ids]] = pts[identity[ids]]
+    world = rotated + origin[ids]
+
+    nsec = len(le)
+    bounds = np.concatenate(([0], np.cumsum(counts, dtype=int)))
+    wingSlices = [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+    return Geometry(le=[rotated[:nsec][w] for w in wingSlices],
+                    leWorld=[world[:nsec][w] for w in wingSlices],
+                    teWorld=[world[nsec:2 * nsec][w] for w in wingSlices],
+                    hinges=world[2 * nsec:])
+
+
+def __addControlSys__(self, wings=None, engine='fast'):
+
+    ctrlSpanPos = dict()
+    for hp in self.hingePoints:
+        ctrlSpanPos.setdefault(hp.wing, []).append(hp.spanpos)
+
+    ctrlHinges = dict()             # wing name -> [(ControlPattern, hinge id), ...]
     for part in self.controlPatterns:
-        for idnum, idname, hinge1, hinge2 in zip(part.idnum, part.idname, part.hinge1, part.hinge2):
+        for hinge1, hinge2 in zip(part.hinge1, part.hinge2):
             for hinge in [hinge1, hinge2]:
+                ctrlHinges.setdefault(self.hingePoints[hinge].wing, []).append((part, hinge))
+
+    for wingname in ctrlHinges:
+        self.GetWing(wingname)      # fails for hinge points on unknown wings
+
+    for wing in (self.wingSkeletons if wings is None else wings):
+        with instrument.stage('controlSystem', wing=wing.name):
+            if wing.name in ctrlSpanPos:
+                wing.addCtrlSections(ctrlSpanPos[wing.name], engine)
+
+            for part, hinge in ctrlHinges.get(wing.name, []):
                 spanpos = self.hingePoints[hinge].spanpos
                 chordpos = self.hingePoints[hinge].chordpos
-                wingname = self.hingePoints[hinge].wing
                 hingetype = self.hingePoints[hinge].type
-                wing = [wing for wing in self.wingSkeletons if wing.name == wingname][0]
 
-                info = Info()
-                info.name = part.name
-                info.Xhinge = chordpos if hingetype == 'TEF' else (0 - chordpos)
-                info.SgnDup = 1 if max(part.factor) * min(part.factor) > 0 else -1
+                info = Info(name=part.name,
+                            Xhinge=chordpos if hingetype == 'TEF' else (0 - chordpos),
+                            SgnDup=1 if max(part.factor) * min(part.factor) > 0 else -1)
 
                 secname = wing.GetWingSecName(spanpos)
                 self.hingePoints[hinge].section = secname
@@ -178,15 +480,15 @@ def __addControlSys__(self):
                     continue
 
 
-def __addCtrlSections__(self, ctrlSpanPos):
+def __addCtrlSections__(self, ctrlSpanPos, engine='fast'):
 
     if not ctrlSpanPos or ctrlSpanPos is None:
         return
 
-    LE_y = [sec.center[1] for sec in self.wingSecs]
+    index = self.spanIndex
 
-    maxSpanPos = max(LE_y)
-    minSpanPos = min(LE_y)
+    maxSpanPos = index.max
+    minSpanPos = index.min
     SPAN = maxSpanPos - minSpanPos
 
     if "autosym" in self.flags:
@@ -195,148 +497,34 @@ def __addCtrlSections__(self, ctrlSpanPos):
         ctrlPos = [maxSpanPos - pos * SPAN for pos in ctrlSpanPos if pos <= 1.0]
 
 
-    ids = [__findIndex__(LE_y, pos) for pos in ctrlPos]
+    if not ctrlPos:
+        return
+
+    ids = [index.find(pos) for pos in ctrlPos]
+
+    with instrument.stage('interpolate', wing=self.name):
+        ctrlSecs = __interpSections__(self, [self.wingSecs[id2] for id1, id2 in ids],
+                                      [self.wingSecs[id1] for id1, id2 in ids], ctrlPos, engine)
 
-    ctrlSecs = [__interpSection__(self.wingSecs[id2], self.wingSecs[id1], pos) \
-                   for pos, (id1,id2) in zip(ctrlPos, ids)]
+    secIndex = self.secIndex
 
     for pos, newsec in zip(ctrlPos, ctrlSecs):
-        id1, id2 = __findIndex__(LE_y, pos)
+        id1, id2 = index.find(pos)
 
         if id1 != id2:
-            LE_y.insert(id1, pos)
+            index.insert(id1, pos)
             self.wingSecs.insert(id1, newsec)
+            secIndex.setdefault(newsec.name, newsec)
+            instrument.count('interpolatedSections', wing=self.name)
         else:   # do nothing because ctrlSec coincides with exising sections
             pass
 
+    self._secIndex = (secIndex, len(self.wingSecs))
 
-def __interpSection__(rightSec, leftSec, pos):
-    from interploate import interpSection
-    return interpSection(rightSec, leftSec, pos, WingSection())
-
-
-def __findIndex__(posList, newpos):
-    id1 = None
-    id2 = None
-
-    if newpos > max(posList) or newpos < min(posList):
-        return id1, id2
-
-    for id, pos in enumerate(posList):
-        if pos > newpos:
-            continue
-        elif abs(pos - newpos) < 0.001:     # # wingroot - id1 = pos/newpos = id2 - wingtip
-            id1 = id
-            id2 = id
-            break
-        else:                               # wingroot - id1 < pos < id2 - wingtip
-            id1 = id
-            id2 = id1 - 1 if id1 >= 1 else id1
-            break
-
-    return id1, id2
-
-
-def __plot__(self):
-        for wing in self.wingSkeletons:
-            wing.plot()
-
-        for part in self.controlPatterns:
-            for idnum, idname, hinge1, hinge2 in zip(part.idnum, part.idname, part.hinge1, part.hinge2):
-                hps = list()
-                for hinge in [hinge1, hinge2]:
-                    secname = self.hingePoints[hinge].section
-                    wingname = self.hingePoints[hinge].wing
-                    chordpos = self.hingePoints[hinge].chordpos
-
-                    if not secname:             # empty secname because hinge on the left wing
-                        break
-
-                    wing = [wing for wing in self.wingSkeletons if wing.name == wingname][0]
-                    sec = [sec for sec in wing.wingSecs if sec.name == secname][0]
-
-                    rotve = wing.rotate
-                    trans = wing.origin
-
-                    chord = sec.chord
-                    center = sec.center
-
-                    from rotation import translate, rotate
-                    hp = translate([chordpos * chord, 0, 0], center)
-                    hp = rotate(rotve, hp)
-                    hp = translate(trans, hp)
-
-                    hps.append(hp)
-
-                if not hps:
-                    break
-
-                import numpy as np  # covert to 2D array
-                hps = np.array(hps)
-
-                plt.figure(1000)
-                plt.plot(hps[:,0], hps[:,1], '--og')
-
-                plt.figure(2000)
-                plt.plot(hps[:,0], hps[:,2], '--og')
-
-
-def __WingSkeleton_plot__(self):
-    trans = self.origin
-    rotve = self.rotate
-
-    # plot leading edges (le) and trailing edges (te)
-    from rotation import translate, rotate
-    le = [sec.center for sec in self.wingSecs]
-    te = [translate([sec.chord, 0, 0], pos) for sec, pos in zip(self.wingSecs, le)]
-
-    # rotate first
-    le = [rotate(rotve, pos) for pos in le]
-    te = [rotate(rotve, pos) for pos in te]
-
-    # translate second
-    le = [translate(trans, pos) for pos in le]
-    te = [translate(trans, pos) for pos in te]
-
-    import numpy as np          # covert to 2D array
-    le = np.array(le)
-    te = np.array(te)
-
-    # figure-1: X-Y plot
-    plt.figure(1000)
-    plt.xlabel("X")
-    plt.ylabel("Y")
-    plt.plot(le[:, 0], le[:, 1], '-or')
-    plt.plot(te[:, 0], te[:, 1], '-ob')
-
-    for l, t in zip(le, te):
-        plt.plot([l[0], t[0]], [l[1], t[1]], '-y')
-
-    # figure-2: X-Z plot
-    plt.figure(2000)
-    plt.xlabel("X")
-    plt.ylabel("Z")
-    plt.plot(le[:, 0], le[:, 2], '-or')
-    plt.plot(te[:, 0], te[:, 2], '-ob')
-
-    for l, t in zip(le, te):
-        plt.plot([l[0], t[0]], [l[2], t[2]], '-y')
-
-    # figure-3: Y-Z plot
-    plt.figure(3000)
-    plt.xlabel("Y")
-    plt.ylabel("Z")
-    plt.plot(le[:, 1], le[:, 2], '-or')
-    plt.plot(te[:, 1], te[:, 2], '-ob')
-
-    for l, t in zip(le, te):
-        plt.plot([l[1], t[1]], [l[2], t[2]], '-y')
-
-    # figure-4: airfoil plot
-    plt.figure(4000)
-    plt.xlabel("CHORD")
-    for sec in self.wingSecs:
-        sec.plot()
-
-    plt.legend()
 
+def __interpSections__(self, rightSecs, leftSecs, ctrlPos, engine='fast'):
+    if engine == 'reference':
+        from reference import interpSection
+        return [interpSection(r, l, pos) for r, l, pos in zip(rightSecs, leftSecs, ctrlPos)]
+    from interploate import interpSections
+    return interpSections(rightSecs, leftSecs, ctrlPos, self.airfoilTable)
@@ -0,0 +1,273 @@
+import argparse
+import math
+import os
+import sys
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from synthetic import GenerateSMX
+from writeAVl import SMX_FILE, AvlParams, convert
+
+# ---------------------- Differential Check ----------------------------- #
+# Converts the same SMX documents with the fast and the reference engine (see
+# reference.py) and compares the two AVL files field by field. Both files
+# must have the same surfaces, sections and controls; the numbers of every
+# field may differ by at most its tolerance. The engines differ by design in
+# the airfoils: the fast engine decimates dense airfoils to a tolerance and
+# interpolates onto a cosine grid, the reference engine keeps every second
+# point and interpolates onto the stations of a parent section. Airfoils are
+# therefore compared as curves, by the largest distance of the points of
+# either one from the other. Run as `python differential.py`, the exit status
+# is non-zero if a field is out of tolerance.
+
+FIELDS = ['header', 'surface', 'Xle', 'Yle', 'Zle', 'chord', 'angle', 'airfoil', 'Xhinge', 'control', 'body']
+
+TOLERANCES = {'header': 0.0,
+              'surface': 0.0,
+              'Xle': 1e-3,          # the last digit written, rotated by scipy or by one matrix
+              'Yle': 1e-3,
+              'Zle': 1e-3,
+              'chord': 1e-3,
+              'angle': 1e-3,
+              'airfoil': 2e-3,      # in airfoil coordinates
+              'Xhinge': 0.0,
+              'control': 0.0,       # gain and SgnDup
+              'body': 0.0}
+
+
+# ---------------------- Reading AVL Files ------------------------------ #
+def readAVL(text):
+    # {'header': numbers, 'surfaces': [...], 'bodies': [...]} of an AVL file
+    # as written by AvlWriter; a surface holds its name, its numbers and its
+    # sections, a section its name, its numbers, airfoil and controls
+    lines = [line.strip() for line in text.splitlines()]
+    avl = {'header': [], 'surfaces': [], 'bodies': []}
+    target = avl
+    numbers = avl['header']
+    section = None
+
+    def nextData(i):
+        # index of the next line that is neither empty nor a comment
+        while i < len(lines) and (not lines[i] or lines[i].startswith('#')):
+            i += 1
+        return i
+
+    i = 1                   # after the title
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if not line or line.startswith('#'):
+            continue
+
+        if line == 'SURFACE':
+            target = {'name': lines[i], 'numbers': [], 'sections': []}
+            avl['surfaces'].append(target)
+            numbers = target['numbers']
+            i += 1
+        elif line == 'BODY':
+            target = {'name': lines[i], 'numbers': []}
+            avl['bodies'].append(target)
+            numbers = target['numbers']
+            i += 1
+        elif line == 'SECTION':
+            section = {'name': lines[i].lstrip('#'), 'numbers': [], 'airfoil': None, 'controls': []}
+            target['sections'].append(section)
+            numbers = section['numbers']
+            i += 1
+        elif line == 'AIRFOIL':
+            rows = list()
+            while i < len(lines) and lines[i]:
+                rows.append(lines[i].split())
+                i += 1
+            section['airfoil'] = np.array(rows, dtype=float).reshape(-1, 2)
+        elif line == 'CONTROL':
+            i = nextData(i)
+            name, *values = lines[i].split()
+            section['controls'].append((name, [float(v) for v in values]))
+            i += 1
+        elif line == 'BFIL':
+            i = nextData(i)
+            target['BFIL'] = lines[i]
+            i += 1
+        elif line in ('YDUPLICATE', 'ANGLE', 'SCALE', 'TRANSLATE'):
+            numbers.append(line)        # keeps the keywords in order
+        else:
+            numbers.extend(float(value) for value in line.split())
+
+    return avl
+
+
+# ---------------------- Comparison ------------------------------------- #
+def curveDistance(points, curve):
+    # largest distance of the points from the polyline curve
+    if len(curve) < 2:
+        return np.sqrt(((points[:, None] - curve[None]) ** 2).sum(axis=2)).min(axis=1).max()
+    start = curve[:-1]
+    segment = curve[1:] - start
+    length2 = (segment ** 2).sum(axis=1)
+    length2[length2 == 0.0] = 1.0
+    rel = points[:, None, :] - start[None]
+    t = np.clip((rel * segment).sum(axis=2) / length2, 0.0, 1.0)
+    d = rel - t[..., None] * segment
+    return np.sqrt((d ** 2).sum(axis=2).min(axis=1)).max()
+
+
+def __numbers__(a, b, where, mismatches):
+    # largest difference of two lists of numbers and keywords
+    if len(a) != len(b) or any(isinstance(x, str) != isinstance(y, str) or (isinstance(x, str) and x != y)
+                               for x, y in zip(a, b)):
+        mismatches.append(f"{where}: {a} != {b}")
+        return 0.0
+    return max([abs(x - y) for x, y in zip(a, b) if not isinstance(x, str)], default=0.0)
+
+
+def compareAVL(fast, reference):
+    # (field -> largest difference, list of structural mismatches) of two readAVL results
+    diffs = dict.fromkeys(FIELDS, 0.0)
+    mismatches = list()
+
+    def record(field, value):
+        diffs[field] = max(diffs[field], value)
+
+    record('header', __numbers__(fast['header'], reference['header'], 'header', mismatches))
+
+    names = lambda items: [item['name'] for item in items]
+    if names(fast['surfaces']) != names(reference['surfaces']):
+        mismatches.append(f"surfaces: {names(fast['surfaces'])} != {names(reference['surfaces'])}")
+    for fs, rs in zip(fast['surfaces'], reference['surfaces']):
+        record('surface', __numbers__(fs['numbers'], rs['numbers'], fs['name'], mismatches))
+        if names(fs['sections']) != names(rs['sections']):
+            mismatches.append(f"{fs['name']}: sections {names(fs['sections'])} != {names(rs['sections'])}")
+            continue
+
+        for fsec, rsec in zip(fs['sections'], rs['sections']):
+            where = f"{fs['name']}/{fsec['name']}"
+            if len(fsec['numbers']) != 5 or len(rsec['numbers']) != 5:
+                mismatches.append(f"{where}: {fsec['numbers']} != {rsec['numbers']}")
+            else:
+                for field, x, y in zip(['Xle', 'Yle', 'Zle', 'chord', 'angle'], fsec['numbers'], rsec['numbers']):
+                    record(field, abs(x - y))
+
+            fa, ra = fsec['airfoil'], rsec['airfoil']
+            if fa is None or ra is None or not len(fa) or not len(ra):
+                if (fa is None) != (ra is None):
+                    mismatches.append(f"{where}: airfoil in one file only")
+            else:
+                record('airfoil', max(curveDistance(fa, ra), curveDistance(ra, fa)))
+
+            if [name for name, _ in fsec['controls']] != [name for name, _ in rsec['controls']]:
+                mismatches.append(f"{where}: controls {fsec['controls']} != {rsec['controls']}")
+                continue
+            for (name, fv), (_, rv) in zip(fsec['controls'], rsec['controls']):
+                record('Xhinge', abs(fv[1] - rv[1]))
+                record('control', __numbers__(fv[:1] + fv[2:], rv[:1] + rv[2:], f"{where}/{name}", mismatches))
+
+    if names(fast['bodies']) != names(reference['bodies']):
+        mismatches.append(f"bodies: {names(fast['bodies'])} != {names(reference['bodies'])}")
+    for fb, rb in zip(fast['bodies'], reference['bodies']):
+        record('body', __numbers__(fb['numbers'], rb['numbers'], fb['name'], mismatches))
+        if fb.get('BFIL') != rb.get('BFIL'):
+            mismatches.append(f"{fb['name']}: BFIL {fb.get('BFIL')} != {rb.get('BFIL')}")
+
+    return diffs, mismatches
+
+
+def timeConvert(smxData, params, repeat=3):
+    # (AVL text, best time of repeat conversions)
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = convert(smxData, params, bodyFiles=dict())
+        best = min(best, time.perf_counter() - start)
+    return text, best
+
+
+def differentialCheck(smxData, params=None, repeat=3):
+    # {'diffs', 'mismatches', 'fast', 'reference'}: the comparison and the seconds of both engines
+    params = params if params is not None else AvlParams()
+    fast, fastSeconds = timeConvert(smxData, params, repeat)
+    reference, referenceSeconds = timeConvert(smxData, replace(params, engine='reference'), repeat)
+    diffs, mismatches = compareAVL(readAVL(fast), readAVL(reference))
+    return {'diffs': diffs, 'mismatches': mismatches, 'fast': fastSeconds, 'reference': referenceSeconds}
+
+
+# ---------------------- Cases ------------------------------------------ #
+def randomCases(count, seed=0):
+    # (label, SMX data) of count random synthetic assemblies
+    rng = np.random.default_rng(seed)
+    for n in range(count):
+        kwargs = dict(nwings=int(rng.integers(1, 6)), nsecs=int(rng.integers(2, 12)),
+                      npoints=int(rng.choice([35, 71, 151, 401])), nhinges=int(rng.integers(0, 5)),
+                      npatterns=int(rng.integers(0, 3)), nbodies=int(rng.integers(0, 2)),
+                      seed=int(rng.integers(2**31)))
+        yield f"synthetic {n} {kwargs}", GenerateSMX(**kwargs)
+
+
+def report(label, result, tolerances=TOLERANCES):
+    # prints one case, returns the fields out of tolerance
+    failed = [field for field in FIELDS if result['diffs'][field] > tolerances[field] * (1 + 1e-9)]
+    if result['mismatches']:
+        failed.insert(0, 'structure')
+    speedup = result['reference'] / result['fast'] if result['fast'] else math.inf
+    print(f"{'FAILED' if failed else 'OK':<8s}{label}")
+    print(f"\tfast {result['fast'] * 1e3:9.2f} ms   reference {result['reference'] * 1e3:9.2f} ms   "
+          f"speedup {speedup:6.1f}x")
+    for field in FIELDS:
+        flag = '   *** out of tolerance ***' if field in failed else ''
+        print(f"\t{field:<10s}{result['diffs'][field]:12.3e}  (tolerance {tolerances[field]:.0e}){flag}")
+    for mismatch in result['mismatches']:
+        print(f"\t*** {mismatch} ***")
+    sys.stdout.flush()
+    return failed
+
+
+# ---------------------- Command Line ----------------------------------- #
+def defaultSMX():
+    # SMX_FILE in the working directory or in the repository root, or None
+    for smxFile in (SMX_FILE, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', SMX_FILE)):
+        if os.path.exists(smxFile):
+            return os.path.normpath(smxFile)
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the fast and the reference conversion engine")
+    parser.add_argument('smx', nargs='*', help=f"SMX files to compare (default: {SMX_FILE} of the repository)")
+    parser.add_argument('--random', type=int, default=10, help="number of random synthetic assemblies (default: 10)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="conversions per engine, the best time is reported")
+    parser.add_argument('--bodies', action='store_true', help="also compare the BODY blocks")
+    args = parser.parse_args(argv)
+
+    smxFiles = args.smx
+    if not smxFiles:
+        smxFile = defaultSMX()
+        if smxFile is None:
+            parser.error(f"{SMX_FILE} not found, give the SMX files to compare")
+        smxFiles = [smxFile]
+
+    cases = list()
+    for smxFile in smxFiles:
+        with open(smxFile, 'rb') as file:
+            cases.append((smxFile, file.read()))
+
+    params = AvlParams(bodies=args.bodies)
+    failed = 0
+    fastTotal = referenceTotal = 0.0
+    count = 0
+    for label, smxData in [*cases, *randomCases(args.random, args.seed)]:
+        result = differentialCheck(smxData, params, args.repeat)
+        failed += bool(report(label, result))
+        fastTotal += result['fast']
+        referenceTotal += result['reference']
+        count += 1
+
+    print(f"{count - failed} of {count} cases within tolerance; fast {fastTotal:.3f} s, "
+          f"reference {referenceTotal:.3f} s in total")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+# Import-time regression check for the converter: importing the conversion
+# modules must stay below BUDGET seconds and must not pull in plotting.
+# Run as `python importcheck.py`, the exit status is non-zero on a regression.
+
+MODULES = ['writeAVl', 'sumo2avl']
+FORBIDDEN = ['matplotlib']
+BUDGET = 0.5        # seconds
+REPEAT = 3
+
+
+def measureImportTime(modules=MODULES):
+    code = f"import sys; import {', '.join(modules)}; print(' '.join(m for m in {FORBIDDEN!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+    # stderr lines read "import time: self [us] | cumulative | imported package"
+    seconds = 0.0
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() in modules:
+            seconds += int(fields[1]) * 1e-6
+
+    return seconds, result.stdout.split()
+
+
+def main():
+    seconds, loaded = min(measureImportTime() for _ in range(REPEAT))
+
+    print(f"import {', '.join(MODULES)}: {seconds:.3f} s (budget {BUDGET:.3f} s)")
+    if loaded:
+        print(f"*** conversion imports {', '.join(loaded)} ***")
+    if seconds > BUDGET:
+        print("*** import time over budget ***")
+
+    return 1 if loaded or seconds > BUDGET else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
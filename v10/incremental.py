@@ -0,0 +1,91 @@
+import hashlib
+import io
+
+import numpy as np
+
+from constructor import ConstructAssemblyFromFile
+from writeAVl import AvlParams, AvlWriter, bodyFilePrefix, bodyShapes, checkBodyFiles, writeBodyFiles
+
+# ------------------- Incremental Conversion ----------------------------- #
+# Keeps the rendered SURFACE block of every wing between conversions and only
+# rebuilds the wings whose fingerprint changed. A fingerprint covers the
+# WingSkeleton with its sections, the hinge points on the wing, the control
+# patterns that move them and the conversion parameters.
+
+def WingFingerprint(assembly, wing, params):
+    # must be taken before addControlSys inserts the control sections
+    digest = hashlib.sha256(repr((params, wing.flags, wing.name, wing.origin, wing.rotate)).encode())
+
+    for sec in wing.wingSecs:
+        digest.update(repr((sec.name, sec.chord, sec.dihedral, sec.twist, sec.yaw, sec.center)).encode())
+        digest.update(np.ascontiguousarray(sec.points).tobytes())
+
+    hinges = [id for id, hp in enumerate(assembly.hingePoints) if hp.wing == wing.name]
+    for id in hinges:
+        hp = assembly.hingePoints[id]
+        digest.update(repr((hp.name, hp.type, hp.spanpos, hp.chordpos)).encode())
+
+    # SgnDup depends on all factors of a pattern, so the whole pattern counts
+    for part in assembly.controlPatterns:
+        if any(hinge in hinges for hinge in part.hinge1 + part.hinge2):
+            digest.update(repr((part.name, part.factor, part.idname, part.idnum)).encode())
+
+    return digest.hexdigest()
+
+
+class IncrementalConverter:
+    def __init__(self, params=None):
+        self.params = params if params is not None else AvlParams()
+        self.blocks = dict()        # fingerprint -> rendered SURFACE block
+        self.rebuilt = list()       # names of the wings rebuilt by the last conversion
+
+    def convert(self, smxFile, avlFile=None, bodyFiles=None, bodyPrefix=None):
+        # returns the AVL text, which is also written to avlFile (name or stream) if given;
+        # with bodies, the BFIL files are written next to a named avlFile or go to
+        # bodyFiles (see writeAVl.checkBodyFiles), named with bodyPrefix
+        checkBodyFiles(self.params, avlFile, bodyFiles)
+        if bodyPrefix is None:
+            bodyPrefix = bodyFilePrefix(avlFile) if avlFile is not None else ''
+        assembly = ConstructAssemblyFromFile(smxFile, self.params.bodies)
+        fingerprints = [WingFingerprint(assembly, wing, self.params) for wing in assembly.wingSkeletons]
+
+        changed = [wing for wing, fp in zip(assembly.wingSkeletons, fingerprints) if fp not in self.blocks]
+        assembly.addControlSys(changed)
+
+        blocks = dict()
+        for wing, fp in zip(assembly.wingSkeletons, fingerprints):
+            if fp in blocks:
+                continue
+            elif fp in self.blocks:
+                blocks[fp] = self.blocks[fp]
+            else:
+                buffer = io.StringIO()
+                AvlWriter(buffer, self.params, started=True).writeSurface(wing, assembly.ctrlInfo)
+                blocks[fp] = buffer.getvalue()
+
+        self.blocks = blocks        # blocks of wings that are gone are dropped
+        self.rebuilt = [wing.name for wing in changed]
+
+        header = io.StringIO()
+        AvlWriter(header, self.params).writeHeader()
+        text = header.getvalue() + ''.join(blocks[fp] for fp in fingerprints)
+
+        if self.params.bodies:
+            # bodies are cheap to render, they are not kept
+            bodies = io.StringIO()
+            AvlWriter(bodies, self.params, started=True, bodyPrefix=bodyPrefix).writeBodies(assembly.bodySkeletons)
+            text += bodies.getvalue()
+
+        if hasattr(avlFile, 'write'):
+            avlFile.write(text)
+        elif avlFile is not None:
+            with open(avlFile, 'w') as file:
+                file.write(text)
+
+        if self.params.bodies:
+            if avlFile is not None and not hasattr(avlFile, 'write'):
+                writeBodyFiles(assembly, avlFile, bodyPrefix)
+            else:
+                bodyFiles.update(bodyShapes(assembly, bodyPrefix))
+
+        return text
@@ -0,0 +1,102 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# ------------------- Stage Instrumentation ------------------------------ #
+# Opt-in timers and counters around the conversion stages. Nothing is
+# recorded unless a Profiler is enabled, in which case
+#
+#     with instrument.stage('interpolate', wing=wing.name):
+#         ...
+#     instrument.count('points', len(points), wing=wing.name)
+#
+# add up per stage and per wing, and report() returns them as a JSON-ready
+# dict. With memory=True the net bytes allocated in every stage are traced
+# as well (via tracemalloc, which slows the conversion down).
+
+class Profiler:
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.stages = dict()        # stage -> {'calls', 'seconds'[, 'allocatedBytes']}
+        self.wings = dict()         # wing -> stage -> {'calls', 'seconds'[, 'allocatedBytes']}
+        self.counters = dict()      # counter -> total
+        self.wingCounters = dict()  # wing -> counter -> total
+        self.ownsTracing = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.ownsTracing = True
+
+    def stop(self):
+        if self.ownsTracing:
+            tracemalloc.stop()
+            self.ownsTracing = False
+
+    @contextmanager
+    def stage(self, name, wing=None):
+        memory = self.memory and tracemalloc.is_tracing()
+        allocated = tracemalloc.get_traced_memory()[0] if memory else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            allocated = tracemalloc.get_traced_memory()[0] - allocated if memory else None
+
+            records = [self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0})]
+            if wing is not None:
+                records.append(self.wings.setdefault(wing, dict()).setdefault(name, {'calls': 0, 'seconds': 0.0}))
+            for record in records:
+                record['calls'] += 1
+                record['seconds'] += seconds
+                if allocated is not None:
+                    record['allocatedBytes'] = record.get('allocatedBytes', 0) + allocated
+
+    def count(self, name, n=1, wing=None):
+        self.counters[name] = self.counters.get(name, 0) + n
+        if wing is not None:
+            counters = self.wingCounters.setdefault(wing, dict())
+            counters[name] = counters.get(name, 0) + n
+
+    def report(self):
+        wings = {wing: {'stages': stages, 'counters': self.wingCounters.get(wing, {})}
+                 for wing, stages in self.wings.items()}
+        for wing, counters in self.wingCounters.items():
+            wings.setdefault(wing, {'stages': {}, 'counters': counters})
+        return {'stages': self.stages, 'counters': self.counters, 'wings': wings}
+
+
+# the enabled Profiler, None while instrumentation is off
+active = None
+
+
+def enable(memory=False):
+    global active
+    disable()
+    active = Profiler(memory)
+    active.start()
+    return active
+
+
+def disable():
+    # returns the Profiler that was enabled, if any
+    global active
+    profiler, active = active, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+@contextmanager
+def stage(name, wing=None):
+    if active is None:
+        yield
+    else:
+        with active.stage(name, wing):
+            yield
+
+
+def count(name, n=1, wing=None):
+    if active is not None:
+        active.count(name, n, wing)
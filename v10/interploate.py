@@ -1,82 +1,93 @@
-# -------------- interpolate related funcitons -------------#
-
-def interpSection(rightSec, leftSec, pos, newSec):
-
-    rpos = rightSec.center[1]
-    lpos = leftSec.center[1]
-
-    if rpos == lpos:
-        return None
-
-    lalpha = (rpos - pos) / (rpos - lpos)
-    ralpha = (pos - lpos) / (rpos - lpos)
-
-    newSec.name = f"interpolated-{pos:.3f}"
-    newSec.center = [rc*ralpha+lc*lalpha for rc,lc in zip(rightSec.center,leftSec.center)]
-    newSec.chord = ralpha*rightSec.chord + lalpha*leftSec.chord
-    newSec.yaw = ralpha * rightSec.yaw + lalpha * leftSec.yaw
-    newSec.twist = ralpha*rightSec.twist + lalpha*leftSec.twist
-    newSec.dihedral = ralpha*rightSec.dihedral + lalpha*leftSec.dihedral
-
-    newSec.points = interpAirfoilPoints(rightSec.points, leftSec.points, ralpha, lalpha)
-
-    return newSec
-
-def interpAirfoilPoints(rpts, lpts, ralpha, lalpha):
-    from scipy.interpolate import interp1d
-
-    rightSec_x, rightSec_y = normalize(rpts)
-    leftSec_x, leftSec_y = normalize(lpts)
-
-    rid = rightSec_x.index(min(rightSec_x))
-    lid = leftSec_x.index(min(leftSec_x))
-
-    rSec_x_upper = rightSec_x[0:rid+1]
-    rSec_x_lower = rightSec_x[rid::]
-
-    lSec_x_upper = leftSec_x[0:lid+1]
-    lSec_x_lower = leftSec_x[lid::]
-
-    rSec_y_upper = rightSec_y[0:rid+1]
-    rSec_y_lower = rightSec_y[rid::]
-
-    lSec_y_upper = leftSec_y[0:lid+1]
-    lSec_y_lower = leftSec_y[lid::]
-
-    if ralpha > lalpha:
-        x_upper = rSec_x_upper
-        x_lower = rSec_x_lower
-
-        lSec_y_upper_interp = interp1d(lSec_x_upper, lSec_y_upper)
-        lSec_y_lower_interp = interp1d(lSec_x_lower, lSec_y_lower)
-
-        lSec_y_upper = lSec_y_upper_interp(x_upper)
-        lSec_y_lower = lSec_y_lower_interp(x_lower)
-
-    else:
-        x_upper = lSec_x_upper
-        x_lower = lSec_x_lower
-
-        rSec_y_upper_interp = interp1d(rSec_x_upper, rSec_y_upper)
-        rSec_y_lower_interp = interp1d(rSec_x_lower, rSec_y_lower)
-
-        rSec_y_upper = rSec_y_upper_interp(x_upper)
-        rSec_y_lower = rSec_y_lower_interp(x_lower)
-
-    y_upper = [lalpha * ly + ralpha * ry for (ly, ry) in zip(lSec_y_upper, rSec_y_upper)]
-    y_lower = [lalpha * ly + ralpha * ry for (ly, ry) in zip(lSec_y_lower, rSec_y_lower)]
-
-
-    newSec_x = x_upper + x_lower[1::]
-    newSec_y = y_upper + y_lower[1::]
+import numpy as np
+from functools import lru_cache
+from datastructure import WingSection
 
+# -------------- interpolate related funcitons -------------#
 
-    return [item for sublist in zip(newSec_x,newSec_y) for item in sublist]
+def interpSections(rightSecs, leftSecs, positions, table=None):
+    # one new section per spanwise position, blended from the parent sections on
+    # either side; the parents are resampled once onto the chordwise grid of table
+    if len(positions) == 0:
+        return []
+    if table is None:
+        table = AirfoilTable(list(rightSecs) + list(leftSecs))
+
+    positions = np.asarray(positions, dtype=float)
+    rpos = np.array([sec.center[1] for sec in rightSecs])
+    lpos = np.array([sec.center[1] for sec in leftSecs])
+
+    valid = rpos != lpos
+    width = np.where(valid, rpos - lpos, 1.0)
+    lalpha = ((rpos - positions) / width)[:, None]
+    ralpha = ((positions - lpos) / width)[:, None]
+
+    def blend(attr):
+        right = np.array([getattr(sec, attr) for sec in rightSecs], dtype=float).reshape(len(positions), -1)
+        left = np.array([getattr(sec, attr) for sec in leftSecs], dtype=float).reshape(len(positions), -1)
+        return right * ralpha + left * lalpha
+
+    centers = blend('center')
+    chords, yaws, twists, dihedrals = (blend(attr)[:, 0] for attr in ('chord', 'yaw', 'twist', 'dihedral'))
+
+    y = table.resampled(rightSecs) * ralpha + table.resampled(leftSecs) * lalpha
+
+    return [WingSection(airfoil="",
+                        name=f"interpolated-{pos:.3f}",
+                        center=centers[i].tolist(),
+                        chord=float(chords[i]),
+                        yaw=float(yaws[i]),
+                        twist=float(twists[i]),
+                        dihedral=float(dihedrals[i]),
+                        points=np.column_stack((table.x, y[i])))
+            if valid[i] else None
+            for i, pos in enumerate(positions)]
+
+
+class AirfoilTable:
+    # Airfoils of a wing resampled onto one shared chordwise grid: the upper
+    # surface from the trailing edge to the leading edge, followed by the lower
+    # surface back to the trailing edge, both at the same cosine-spaced stations.
+    def __init__(self, sections):
+        npoints = [max(id + 1, len(sec.points) - id) for sec, id in
+                   ((sec, np.argmin(sec.points[:, 0])) for sec in sections)]
+        self.grid = cosineGrid(max(npoints))
+        self.x = np.concatenate((self.grid[::-1], self.grid[1::]))
+        self.y = dict()             # section name -> (section, resampled y)
+
+    def resampled(self, sections):
+        # (len(sections), len(x)) array of resampled y, computed once per section
+        rows = list()
+        for sec in sections:
+            cached = self.y.get(sec.name)
+            if cached is None or cached[0] is not sec:
+                cached = (sec, resampleAirfoil(sec.points, self.grid))
+                self.y[sec.name] = cached
+            rows.append(cached[1])
+        return np.array(rows)
+
+
+@lru_cache(maxsize=64)
+def cosineGrid(n):
+    # n stations from the leading edge (0) to the trailing edge (1), clustered at both ends
+    grid = 0.5 * (1.0 - np.cos(np.linspace(0.0, np.pi, n)))
+    grid.flags.writeable = False
+    return grid
+
+
+def resampleAirfoil(pts, grid):
+    pts = normalize(pts)
+    id = np.argmin(pts[:, 0])
+
+    upper = pts[id::-1]             # reversed, so that x is increasing
+    lower = pts[id::]
+
+    y_upper = np.interp(grid, upper[:, 0], upper[:, 1])
+    y_lower = np.interp(grid, lower[:, 0], lower[:, 1])
+
+    return np.concatenate((y_upper[::-1], y_lower[1::]))
 
 
 def normalize(pts):
-    xpts = pts[0::2]
-    ypts = pts[1::2]
-    xmin = min(xpts)
-    xmax = max(xpts)
-    return [(x - xmin) / (xmax - xmin) for x in xpts], [y / (xmax - xmin) for y in ypts]
\ No newline at end of file
+    xmin = pts[:, 0].min()
+    xmax = pts[:, 0].max()
+    return np.column_stack(((pts[:, 0] - xmin) / (xmax - xmin), pts[:, 1] / (xmax - xmin)))
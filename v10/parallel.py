@@ -0,0 +1,146 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree as ET
+from xml.parsers import expat
+
+from constructor import ConstructAssemblyFromFile, ConstructWingSkeleton
+from datastructure import Assembly, WingSkeleton
+from writeAVl import AvlParams, AvlWriter, bodyFilePrefix, bodyShapes, checkBodyFiles, writeBodyFiles
+
+# ------------------- Wing-Parallel Conversion --------------------------- #
+# Converts one large SMX file with its wings spread over worker processes.
+# The WingSkeleton elements are cut out of the document as bytes, so the main
+# process only parses what is left (bodies and the control system). Every
+# worker parses one wing, inserts its control sections and renders its SURFACE
+# block, and the blocks are written in the order of the wings in the file.
+# The wings are located with expat, which only scans the document and calls
+# back for start and end tags, not for the airfoil text.
+
+
+def splitWings(smxData):
+    # (WingSkeleton elements as documents of their own, with the XML declaration
+    # of smxData; their names; smxData without them)
+    if smxData.startswith((b'\xff\xfe', b'\xfe\xff')):
+        raise ValueError("wing-parallel conversion does not support UTF-16 documents")
+
+    parser = expat.ParserCreate()
+    spans = list()              # (start, end) of the wings
+    names = list()
+    declaration = b''
+    depth = 0                   # inside a wing
+    start = None
+
+    def startElement(tag, attrib):
+        nonlocal depth, start
+        if tag == 'WingSkeleton' and not depth:
+            start = parser.CurrentByteIndex
+            names.append(attrib['name'])
+        if tag == 'WingSkeleton' or depth:
+            depth += 1
+
+    def endElement(tag):
+        # reported at the start of an end tag, or after an empty-element tag
+        nonlocal depth
+        if depth:
+            depth -= 1
+            if not depth:
+                index = parser.CurrentByteIndex
+                end = smxData.index(b'>', index) + 1 if smxData.startswith(b'</', index) else index
+                spans.append((start, end))
+
+    def xmlDecl(version, encoding, standalone):
+        nonlocal declaration
+        if encoding and encoding.lower().replace('-', '').startswith(('utf16', 'utf32')):
+            raise ValueError(f"wing-parallel conversion does not support {encoding} documents")
+        text = f'<?xml version="{version}"'
+        if encoding:
+            text += f' encoding="{encoding}"'
+        declaration = (text + '?>').encode()
+
+    def doctype(name, systemId, publicId, internalSubset):
+        # entities declared there would be missing in the wings
+        if internalSubset:
+            raise ValueError("wing-parallel conversion does not support a DOCTYPE with an internal subset")
+
+    parser.StartElementHandler = startElement
+    parser.EndElementHandler = endElement
+    parser.XmlDeclHandler = xmlDecl
+    parser.StartDoctypeDeclHandler = doctype
+    parser.Parse(smxData, True)
+
+    wings = [declaration + smxData[first:last] for first, last in spans]
+    rest = list()
+    previous = 0
+    for first, last in spans:
+        rest.append(smxData[previous:first])
+        previous = last
+    rest.append(smxData[previous:])
+    return wings, names, b''.join(rest)
+
+
+def renderWing(wingXml, wingNames, hingePoints, controlPatterns, params):
+    # runs in the workers: the SURFACE block of one wing. The other wings are
+    # only present by name, so that addControlSys knows the wings of all hinges.
+    wing = ConstructWingSkeleton(ET.fromstring(wingXml))
+
+    assembly = Assembly()
+    assembly.wingSkeletons = [wing if name == wing.name else WingSkeleton('', name, [0.0] * 3, [0.0] * 3, [])
+                              for name in wingNames]
+    assembly.hingePoints = hingePoints
+    assembly.controlPatterns = controlPatterns
+    assembly.addControlSys([wing])
+
+    buffer = io.StringIO()
+    AvlWriter(buffer, params, started=True).writeSurface(wing, assembly.ctrlInfo)
+    return buffer.getvalue()
+
+
+def __readSource__(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, 'read'):
+        return source.read()
+    with open(source, 'rb') as file:
+        return file.read()
+
+
+def convertParallel(source, params=None, stream=None, workers=None, bodyFiles=None):
+    # like writeAVl.convert, for SMX bytes, a file name or a binary file object:
+    # returns the AVL text, or writes it to stream (and returns None)
+    params = params if params is not None else AvlParams()
+    checkBodyFiles(params, stream, bodyFiles)
+    buffer = stream if stream is not None else io.StringIO()
+    assembly = __convertParallel__(__readSource__(source), buffer, params, workers)
+    if params.bodies:
+        bodyFiles.update(bodyShapes(assembly))
+    return buffer.getvalue() if stream is None else None
+
+
+def writeParallel(source, avlFile, params=None, workers=None):
+    # convertParallel to the file avlFile, with the BFIL files next to it
+    params = params if params is not None else AvlParams()
+    with open(avlFile, 'w') as file:
+        assembly = __convertParallel__(__readSource__(source), file, params, workers, bodyFilePrefix(avlFile))
+    if params.bodies:
+        writeBodyFiles(assembly, avlFile)
+
+
+def __convertParallel__(smxData, stream, params=None, workers=None, bodyPrefix=''):
+    # returns the assembly without its wings
+    params = params if params is not None else AvlParams()
+    wings, names, rest = splitWings(smxData)
+    assembly = ConstructAssemblyFromFile(io.BytesIO(rest), params.bodies)
+
+    writer = AvlWriter(stream, params, bodyPrefix=bodyPrefix)
+    writer.writeHeader()
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, max(len(wings), 1))) as pool:
+        n = len(wings)
+        blocks = pool.map(renderWing, wings, [names] * n, [assembly.hingePoints] * n,
+                          [assembly.controlPatterns] * n, [params] * n)
+        for block in blocks:                # in order, each as soon as it is done
+            stream.write(block)
+    if params.bodies:
+        writer.writeBodies(assembly.bodySkeletons)
+
+    return assembly
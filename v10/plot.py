@@ -0,0 +1,87 @@
+import numpy as np
+import matplotlib.pyplot as plt
+
+# ------------------- Plotting Functions ------------------------------- #
+# kept apart from datastructure.py so that a conversion never imports matplotlib
+def plotAssembly(self):
+    geometry = self.geometry()
+
+    for wing, le, te in zip(self.wingSkeletons, geometry.leWorld, geometry.teWorld):
+        plotWingSkeleton(wing, le, te)
+
+    for part in self.controlPatterns:
+        for idnum, idname, hinge1, hinge2 in zip(part.idnum, part.idname, part.hinge1, part.hinge2):
+            hps = list()
+            for hinge in [hinge1, hinge2]:
+                if not self.hingePoints[hinge].section:     # empty secname because hinge on the left wing
+                    break
+
+                hps.append(geometry.hinges[hinge])
+
+            if not hps:
+                break
+
+            hps = np.array(hps)             # covert to 2D array
+
+            plt.figure(1000)
+            plt.plot(hps[:,0], hps[:,1], '--og')
+
+            plt.figure(2000)
+            plt.plot(hps[:,0], hps[:,2], '--og')
+
+    plt.show()
+
+
+def plotWingSkeleton(self, le=None, te=None):
+    # plot leading edges (le) and trailing edges (te), in the assembly frame
+    if le is None or te is None:
+        le = np.array([sec.center for sec in self.wingSecs])
+        te = le.copy()
+        te[:, 0] += [sec.chord for sec in self.wingSecs]
+
+        # rotate first, translate second
+        le = self.transform.apply(le)
+        te = self.transform.apply(te)
+
+    # figure-1: X-Y plot
+    plt.figure(1000)
+    plt.xlabel("X")
+    plt.ylabel("Y")
+    plt.plot(le[:, 0], le[:, 1], '-or')
+    plt.plot(te[:, 0], te[:, 1], '-ob')
+
+    for l, t in zip(le, te):
+        plt.plot([l[0], t[0]], [l[1], t[1]], '-y')
+
+    # figure-2: X-Z plot
+    plt.figure(2000)
+    plt.xlabel("X")
+    plt.ylabel("Z")
+    plt.plot(le[:, 0], le[:, 2], '-or')
+    plt.plot(te[:, 0], te[:, 2], '-ob')
+
+    for l, t in zip(le, te):
+        plt.plot([l[0], t[0]], [l[2], t[2]], '-y')
+
+    # figure-3: Y-Z plot
+    plt.figure(3000)
+    plt.xlabel("Y")
+    plt.ylabel("Z")
+    plt.plot(le[:, 1], le[:, 2], '-or')
+    plt.plot(te[:, 1], te[:, 2], '-ob')
+
+    for l, t in zip(le, te):
+        plt.plot([l[1], t[1]], [l[2], t[2]], '-y')
+
+    # figure-4: airfoil plot
+    plt.figure(4000)
+    plt.xlabel("CHORD")
+    for sec in self.wingSecs:
+        sec.plot()
+
+    plt.legend()
+
+
+def plotWingSection(self):
+    style = '--' if 'interp' in self.name else '-'
+    plt.plot(self.points[:, 0], self.points[:, 1], style, label=self.name)
@@ -0,0 +1,160 @@
+import numpy as np
+
+from datastructure import WingSection
+from rotation import reduce
+from writeAVl import AvlWriter
+
+# ------------------- Reference Engine ----------------------------------- #
+# The conversion as it was first written, kept as the baseline the fast
+# engine is checked against (see differential.py): leading edges rotated one
+# section at a time with scipy, airfoils interpolated with interp1d onto the
+# chordwise stations of the closer parent section, dense airfoils reduced to
+# every second point, and the AVL lines collected in a list and joined at the
+# end. Selected with AvlParams(engine='reference'); needs scipy.
+
+def str8(value):
+    return "%.8f" % value
+
+
+def rotate(rot_vec, center):
+    from scipy.spatial.transform import Rotation as R
+
+    rot_vec = np.array(rot_vec)
+    center = np.array(center)
+
+    if np.linalg.norm(rot_vec) < 1e-3:
+        return center.tolist()
+    else:
+        rx = R.from_rotvec(rot_vec[0] * np.array([1, 0, 0]))
+        ry = R.from_rotvec(rot_vec[1] * np.array([0, 1, 0]))
+        rz = R.from_rotvec(rot_vec[2] * np.array([0, 0, 1]))
+        rxyz = rz * ry * rx
+
+        center = rxyz.apply(center)
+        return center.round(3).tolist()
+
+
+# -------------- interpolate related funcitons -------------#
+
+def interpSection(rightSec, leftSec, pos):
+
+    rpos = rightSec.center[1]
+    lpos = leftSec.center[1]
+
+    if rpos == lpos:
+        return None
+
+    lalpha = (rpos - pos) / (rpos - lpos)
+    ralpha = (pos - lpos) / (rpos - lpos)
+
+    points = interpAirfoilPoints(rightSec.points.ravel().tolist(), leftSec.points.ravel().tolist(), ralpha, lalpha)
+
+    return WingSection(airfoil="",
+                       name=f"interpolated-{pos:.3f}",
+                       center=[rc*ralpha+lc*lalpha for rc,lc in zip(rightSec.center,leftSec.center)],
+                       chord=ralpha*rightSec.chord + lalpha*leftSec.chord,
+                       yaw=ralpha * rightSec.yaw + lalpha * leftSec.yaw,
+                       twist=ralpha*rightSec.twist + lalpha*leftSec.twist,
+                       dihedral=ralpha*rightSec.dihedral + lalpha*leftSec.dihedral,
+                       points=np.array(points).reshape(-1, 2))
+
+
+def interpAirfoilPoints(rpts, lpts, ralpha, lalpha):
+    from scipy.interpolate import interp1d
+
+    rightSec_x, rightSec_y = normalize(rpts)
+    leftSec_x, leftSec_y = normalize(lpts)
+
+    rid = rightSec_x.index(min(rightSec_x))
+    lid = leftSec_x.index(min(leftSec_x))
+
+    rSec_x_upper = rightSec_x[0:rid+1]
+    rSec_x_lower = rightSec_x[rid::]
+
+    lSec_x_upper = leftSec_x[0:lid+1]
+    lSec_x_lower = leftSec_x[lid::]
+
+    rSec_y_upper = rightSec_y[0:rid+1]
+    rSec_y_lower = rightSec_y[rid::]
+
+    lSec_y_upper = leftSec_y[0:lid+1]
+    lSec_y_lower = leftSec_y[lid::]
+
+    if ralpha > lalpha:
+        x_upper = rSec_x_upper
+        x_lower = rSec_x_lower
+
+        lSec_y_upper_interp = interp1d(lSec_x_upper, lSec_y_upper)
+        lSec_y_lower_interp = interp1d(lSec_x_lower, lSec_y_lower)
+
+        lSec_y_upper = lSec_y_upper_interp(x_upper)
+        lSec_y_lower = lSec_y_lower_interp(x_lower)
+
+    else:
+        x_upper = lSec_x_upper
+        x_lower = lSec_x_lower
+
+        rSec_y_upper_interp = interp1d(rSec_x_upper, rSec_y_upper)
+        rSec_y_lower_interp = interp1d(rSec_x_lower, rSec_y_lower)
+
+        rSec_y_upper = rSec_y_upper_interp(x_upper)
+        rSec_y_lower = rSec_y_lower_interp(x_lower)
+
+    y_upper = [lalpha * ly + ralpha * ry for (ly, ry) in zip(lSec_y_upper, rSec_y_upper)]
+    y_lower = [lalpha * ly + ralpha * ry for (ly, ry) in zip(lSec_y_lower, rSec_y_lower)]
+
+
+    newSec_x = x_upper + x_lower[1::]
+    newSec_y = y_upper + y_lower[1::]
+
+
+    return [item for sublist in zip(newSec_x,newSec_y) for item in sublist]
+
+
+def normalize(pts):
+    xpts = pts[0::2]
+    ypts = pts[1::2]
+    xmin = min(xpts)
+    xmax = max(xpts)
+    return [(x - xmin) / (xmax - xmin) for x in xpts], [y / (xmax - xmin) for y in ypts]
+
+
+# ---------------------- AVL Writer ----------------------------------- #
+class ReferenceWriter(AvlWriter):
+    # Collects the lines of the whole file and writes them joined in one go.
+    # Only whole assemblies can be written (write), the SURFACE blocks are
+    # not streamed on their own.
+    engine = 'reference'
+
+    def __init__(self, stream, params=None, started=False, bodyPrefix=''):
+        super().__init__(stream, params, started, bodyPrefix)
+        self.lines = list()
+
+    def block(self, text):
+        self.lines.append(text)
+
+    def write(self, assembly):
+        self.writeHeader()
+        for wing in assembly.wingSkeletons:
+            self.writeSurface(wing, assembly.ctrlInfo)
+        if self.params.bodies:
+            self.writeBodies(assembly.bodySkeletons)
+
+        if self.started:
+            self.stream.write('\n')
+        self.stream.write("\n".join(self.lines).expandtabs(8))
+        self.lines = list()
+        self.started = True
+
+    def writeSections(self, wing, ctrlInfo, le=None):
+        for section in wing.wingSecs[::-1]:
+            key = wing.name + '###' + section.name
+            self.writeSection(section, np.array(rotate(wing.rotate, section.center)), ctrlInfo.get(key), key)
+
+    def airfoilPoints(self, section, key=None):
+        return reduce(section.points, self.params.reduceLimit)
+
+    def writeAirfoil(self, points):
+        self.block("AIRFOIL")
+        pts = [str8(pt) + '\n' if i%2==1 else str8(pt) + ' ' for i,pt in enumerate(points.ravel().tolist())]
+        self.block(''.join(pts))
@@ -1,35 +1,131 @@
 import numpy as np
-from scipy.spatial.transform import Rotation as R
+from functools import lru_cache
 
 
-def rotate(rot_vec, center):
-    rot_vec = np.array(rot_vec)
-    center = np.array(center)
+class Transform:
+    # rotation about x, then y, then z (in radians), followed by a translation
+    def __init__(self, rot_vec, origin):
+        rx, ry, rz = rot_vec
+        self.identity = np.linalg.norm(rot_vec) < 1e-3
+        self.origin = np.array(origin, dtype=float)
 
-    if np.linalg.norm(rot_vec) < 1e-3:
-        return center.tolist()
-    else:
-        rx = R.from_rotvec(rot_vec[0] * np.array([1, 0, 0]))
-        ry = R.from_rotvec(rot_vec[1] * np.array([0, 1, 0]))
-        rz = R.from_rotvec(rot_vec[2] * np.array([0, 0, 1]))
-        rxyz = rz * ry * rx
+        cx, sx = np.cos(rx), np.sin(rx)
+        cy, sy = np.cos(ry), np.sin(ry)
+        cz, sz = np.cos(rz), np.sin(rz)
 
-        center = rxyz.apply(center)
-        return center.round(3).tolist()
+        Rx = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+        Ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+        Rz = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+        self.matrix = np.eye(3) if self.identity else Rz @ Ry @ Rx
 
+    def rotate(self, pts):
+        # pts is a single point or an (N, 3) array of points
+        pts = np.asarray(pts, dtype=float)
+        return pts.copy() if self.identity else pts @ self.matrix.T
 
-def translate(trans_vec, center):
-    return [x + dx for x, dx in zip(center, trans_vec)]
+    def apply(self, pts):
+        return self.rotate(pts) + self.origin
+
+
+@lru_cache(maxsize=1024)
+def GetTransform(rot_vec, origin=(0.0, 0.0, 0.0)):
+    # rot_vec and origin are tuples, so that the transform can be memoized
+    return Transform(rot_vec, origin)
 
 
 def reduce(pts, lim=600):
-    if len(pts) < lim:
+    if pts.size < lim:
         return pts
 
-    x = pts[0::2]
-    y = pts[1::2]
+    return pts[0::2]
+
+
+def decimate(pts, target, tol=None, limit=None):
+    # Shape-preserving reduction of an (N, 2) airfoil to about target points.
+    # Points are picked from the original ones, evenly in a measure that adds
+    # the turning angle to the arc length, so that the leading edge keeps its
+    # resolution while the flat aft part is thinned out. The trailing edge
+    # points and the leading edge point are always kept. With tol, target is
+    # raised until the largest distance of a dropped point to the reduced
+    # contour is below tol, but the result never has more than limit points,
+    # even if tol is not met there. Returns the reduced points and that distance.
+    limit = max(limit if limit is not None else len(pts), 3)
+    target = min(target, limit)
+    if len(pts) <= max(target, 3):
+        return pts, 0.0
+
+    while True:
+        keep = __decimateIndices__(pts, target)
+        deviation = __deviation__(pts, keep)
+        if tol is None or deviation <= tol or len(keep) == len(pts) or target >= limit:
+            break
+        target = min(int(target * 1.25) + 1, limit)
+
+    while len(keep) > limit:        # the two surfaces are rounded separately
+        target -= 1
+        keep = __decimateIndices__(pts, target)
+        deviation = __deviation__(pts, keep)
+    return pts[keep], deviation
+
+
+def __decimateIndices__(pts, target):
+    le = int(np.argmin(pts[:, 0]))
+
+    seg = np.diff(pts, axis=0)
+    ds = np.hypot(seg[:, 0], seg[:, 1])
+    heading = np.arctan2(seg[:, 1], seg[:, 0])
+    turn = np.abs((np.diff(heading) + np.pi) % (2 * np.pi) - np.pi)   # turning angle at interior points
+
+    # half of the turning angle at either end of a segment is attributed to it
+    scale = ds.sum() / np.pi
+    weight = ds + 0.5 * scale * (np.concatenate(([0.0], turn)) + np.concatenate((turn, [0.0])))
+    measure = np.concatenate(([0.0], np.cumsum(weight)))
+
+    keep = list()
+    for first, last in ((0, le), (le, len(pts) - 1)):
+        if last == first:
+            keep.append(first)
+            continue
+        share = (measure[last] - measure[first]) / measure[-1]
+        n = max(int(round(share * (target - 1))), 1) + 1
+        stations = np.linspace(measure[first], measure[last], n)
+        ids = np.searchsorted(measure[first:last + 1], stations) + first
+        keep.extend(np.clip(ids, first, last).tolist())
+
+    return np.unique(keep)
+
+
+def __deviation__(pts, keep):
+    # distance of every original point to the reduced contour segment spanning it
+    seg = np.clip(np.searchsorted(keep, np.arange(len(pts)), side='right') - 1, 0, len(keep) - 2)
+    a = pts[keep[seg]]
+    b = pts[keep[seg + 1]]
+
+    ab = b - a
+    length = np.einsum('ij,ij->i', ab, ab)
+    t = np.clip(np.einsum('ij,ij->i', pts - a, ab) / np.where(length > 0, length, 1.0), 0.0, 1.0)
+    return float(np.hypot(*(pts - a - t[:, None] * ab).T).max())
+
+
+def equivalentRadii(contours, scales, symmetric):
+    # radii of the circles with the areas of a batch of body frames: contours are
+    # (N, 2) arrays of normalized (y, z), scaled by scales (width * height / 4);
+    # symmetric contours are the y >= 0 half, closed over the symmetry plane.
+    # Frames without a contour are taken as ellipses.
+    counts = np.array([len(c) for c in contours], dtype=int)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    pts = np.concatenate(contours) if counts.sum() else np.empty((0, 2))
+
+    # shoelace sums of all contours at once, every contour closed onto its start
+    following = np.arange(1, len(pts) + 1)
+    nonempty = counts > 0
+    following[(starts + counts - 1)[nonempty]] = starts[nonempty]
+    cross = pts[:, 0] * pts[following, 1] - pts[following, 0] * pts[:, 1]
 
-    x = x[0::2]
-    y = y[0::2]
+    sums = np.zeros(len(contours))
+    if nonempty.any():
+        sums[nonempty] = np.add.reduceat(cross, starts[nonempty])
 
-    return [pt for item in zip(x, y) for pt in item]
+    area = 0.5 * np.abs(sums) * np.where(symmetric, 2.0, 1.0)
+    area = np.where(counts >= 3, area, np.pi)
+    return np.sqrt(area * np.asarray(scales, dtype=float) / np.pi)
@@ -0,0 +1,191 @@
+import dataclasses
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from datastructure import ERROR, WARNING
+from writeAVl import AvlParams, convert
+
+# ------------------- Conversion Server ---------------------------------- #
+# Local HTTP endpoint around a pool of warm worker processes, so that callers
+# pay neither the interpreter start-up nor the imports per conversion, and the
+# memoized transforms and interpolation grids stay cached in the workers.
+#
+#     POST /convert?Mach=0.5&Nchord=16&validate=errors    body: SMX document
+#       200 AVL text, 400 bad parameters, 422 SMX that cannot be converted,
+#       503 when the queue is full (retry later)
+#     GET /health                                          JSON counters
+#
+# Requests beyond workers + queue conversions in flight are rejected at once
+# instead of piling up in the pool.
+
+VALIDATE = {'errors': ERROR, 'all': WARNING}
+
+
+class ParamsError(ValueError):
+    pass
+
+
+def parseParams(query):
+    # AvlParams and validation level from the query string of a request
+    params = AvlParams()
+    values = dict()
+    validate = None
+    for name, value in urllib.parse.parse_qsl(query, keep_blank_values=True):
+        if name == 'validate':
+            if value not in VALIDATE:
+                raise ParamsError(f"validate must be one of {', '.join(VALIDATE)}")
+            validate = VALIDATE[value]
+        elif name in AvlParams.__dataclass_fields__:
+            try:
+                kind = type(getattr(params, name))
+                if kind is bool:
+                    if value.lower() not in ('1', 'true', 'yes', '0', 'false', 'no'):
+                        raise ValueError(value)
+                    values[name] = value.lower() in ('1', 'true', 'yes')
+                else:
+                    values[name] = kind(value)
+            except ValueError:
+                raise ParamsError(f"invalid value '{value}' for {name}") from None
+        else:
+            raise ParamsError(f"unknown parameter '{name}'")
+    if values.get('bodies'):
+        raise ParamsError("bodies are not supported, the BFIL files cannot be returned")
+    try:
+        return dataclasses.replace(params, **values), validate
+    except ValueError as e:
+        raise ParamsError(str(e)) from None
+
+
+def convertData(smxData, params=None, validate=None):
+    # runs in the workers: (status, text), the AVL text or the error message
+    try:
+        return 200, convert(smxData, params, validate=validate)
+    except Exception as e:
+        return 422, f"{type(e).__name__}: {e}"
+
+
+def __warm__():
+    return True
+
+
+class ConversionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers=None, queue=16, cache=None):
+        super().__init__(address, ConversionHandler)
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.slots = threading.BoundedSemaphore(self.workers + queue)
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'converted': 0, 'cached': 0, 'rejected': 0, 'failed': 0, 'seconds': 0.0}
+
+        # start and import in every worker before the first request arrives
+        for future in [self.pool.submit(__warm__) for _ in range(self.workers)]:
+            future.result()
+
+    def count(self, **counts):
+        with self.lock:
+            for name, n in counts.items():
+                self.counters[name] += n
+
+    def convert(self, smxData, params, validate):
+        # (status, text), or None when all slots are taken
+        if not self.slots.acquire(blocking=False):
+            return None
+        try:
+            key = None
+            if self.cache is not None:
+                key = self.cache.key(smxData, (params, validate) if validate else params)
+                text = self.cache.get(key)
+                if text is not None:
+                    self.count(cached=1)
+                    return 200, text
+
+            status, text = self.pool.submit(convertData, smxData, params, validate).result()
+            if status == 200 and key is not None:
+                self.cache.put(key, text)
+            return status, text
+        finally:
+            self.slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path != '/health':
+            return self.reply(404, "not found")
+        with self.server.lock:
+            health = dict(self.server.counters)
+        if self.server.cache is not None:
+            health['cache'] = self.server.cache.stats()
+        self.reply(200, json.dumps(health), 'application/json')
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/convert':
+            return self.reply(404, "not found")
+        self.server.count(requests=1)
+
+        try:
+            params, validate = parseParams(url.query)
+            length = int(self.headers.get('Content-Length', ''))
+        except (ParamsError, ValueError) as e:
+            return self.reply(400, str(e) if isinstance(e, ParamsError) else "Content-Length required")
+        smxData = self.rfile.read(length)
+
+        start = time.perf_counter()
+        result = self.server.convert(smxData, params, validate)
+        if result is None:
+            self.server.count(rejected=1)
+            return self.reply(503, "conversion queue is full", headers={'Retry-After': '1'})
+
+        status, text = result
+        self.server.count(converted=status == 200, failed=status != 200, seconds=time.perf_counter() - start)
+        self.reply(status, text)
+
+    def reply(self, status, text, contentType='text/plain; charset=utf-8', headers=None):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host='127.0.0.1', port=8765, workers=None, queue=16, cache=None):
+    with ConversionServer((host, port), workers, queue, cache) as server:
+        print(f"Serving conversions on http://{host}:{server.server_address[1]}/convert "
+              f"with {server.workers} workers")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+# ------------------- Client ---------------------------------------------- #
+def requestConversion(url, smxData, timeout=None, **params):
+    # AVL text converted by the server at url, e.g. 'http://127.0.0.1:8765';
+    # params are AvlParams fields or validate; raises urllib.error.HTTPError
+    query = urllib.parse.urlencode(params)
+    request = urllib.request.Request(f"{url.rstrip('/')}/convert?{query}", data=smxData, method='POST',
+                                     headers={'Content-Type': 'application/xml'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read().decode()
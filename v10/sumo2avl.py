@@ -0,0 +1,230 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import instrument
+from cache import ConversionCache
+from writeAVl import ENGINES, AvlParams, convertSMX
+from datastructure import ERROR, WARNING
+
+
+# ----------------------- Input Collection ------------------------------ #
+def expandPattern(pattern):
+    # patterns are expanded here as well, the shell does not do it everywhere
+    matches = sorted(glob.glob(pattern, recursive=True))
+    return matches if matches else [pattern]
+
+
+def readManifest(manifest):
+    # one SMX file or glob pattern per line, relative to the manifest location
+    base = os.path.dirname(os.path.abspath(manifest))
+    patterns = list()
+    with open(manifest) as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                patterns.append(os.path.join(base, line))
+    return patterns
+
+
+def collectJobs(patterns, manifest=None, outDir=None):
+    if manifest:
+        patterns = list(patterns) + readManifest(manifest)
+
+    smxFiles = list()
+    for pattern in patterns:
+        for smxFile in expandPattern(pattern):
+            if smxFile not in smxFiles:
+                smxFiles.append(smxFile)
+
+    # SMX files with the same name in different directories would overwrite
+    # each other's AVL file in outDir
+    jobs = list()
+    targets = dict()
+    for smxFile in smxFiles:
+        avlFile = os.path.splitext(smxFile)[0] + '.avl'
+        if outDir:
+            avlFile = os.path.join(outDir, os.path.basename(avlFile))
+        target = os.path.normcase(os.path.abspath(avlFile))
+        if target in targets:
+            raise ValueError(f"{targets[target]} and {smxFile} are both converted to {avlFile}")
+        targets[target] = smxFile
+        jobs.append((smxFile, avlFile))
+
+    return jobs
+
+
+# ----------------------- Conversion ------------------------------------ #
+def convertJob(smxFile, avlFile, cache=None, profile=None, validate=None, params=None, wingWorkers=None):
+    # profile: None, 'time' or 'memory' to record the stages, see instrument.py;
+    # validate: None, ERROR or WARNING, the issues that fail the conversion;
+    # wingWorkers: convert the wings of the file on that many processes, see parallel.py
+    if profile:
+        instrument.enable(memory=profile == 'memory')
+    start = time.perf_counter()
+    hit = None
+    try:
+        if wingWorkers:
+            from parallel import writeParallel
+            writeParallel(smxFile, avlFile, params, wingWorkers)
+        else:
+            hit = convertSMX(smxFile, avlFile, params=params, cache=cache, validate=validate)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    profiler = instrument.disable() if profile else None
+    return smxFile, avlFile, seconds, error, hit, profiler.report() if profiler else None
+
+
+def convertBatch(jobs, workers=None, cache=None, profile=None, validate=None, params=None, wingWorkers=None):
+    # yields (smxFile, avlFile, seconds, error, cache hit, profile) in order of completion
+    if workers == 1 or len(jobs) <= 1:
+        for smxFile, avlFile in jobs:
+            yield convertJob(smxFile, avlFile, cache, profile, validate, params, wingWorkers)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(convertJob, smxFile, avlFile, cache, profile, validate, params, wingWorkers) for smxFile, avlFile in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def profileReport(results):
+    # per file stages, wings and counters, plus the stage totals of all files
+    files = dict()
+    stages = dict()
+    for smxFile, avlFile, seconds, error, hit, profile in results:
+        if profile is None:
+            continue
+        files[smxFile] = dict(profile, seconds=seconds, cached=bool(hit), error=error)
+        for stage, record in profile['stages'].items():
+            total = stages.setdefault(stage, dict.fromkeys(record, 0))
+            for name, value in record.items():
+                total[name] = total.get(name, 0) + value
+    return {'stages': stages, 'files': files}
+
+
+def writeProfile(profile, path):
+    if path == '-':
+        json.dump(profile, sys.stdout, indent=2)
+        print()
+    else:
+        with open(path, 'w') as file:
+            json.dump(profile, file, indent=2)
+
+
+def report(result):
+    smxFile, avlFile, seconds, error, hit = result[:5]
+    if error is None:
+        status = 'CACHED' if hit else 'OK'
+        print(f"{status:<8s}{seconds:8.3f} s  {smxFile} -> {avlFile}")
+    else:
+        print(f"FAILED  {seconds:8.3f} s  {smxFile}: {error}")
+    sys.stdout.flush()
+
+
+# ----------------------- Command Line ---------------------------------- #
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='sumo2avl', description="Convert Sumo SMX geometries to AVL input files")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help="convert one or more SMX files")
+    convert.add_argument('smx', nargs='*', help="SMX files or glob patterns")
+    convert.add_argument('-m', '--manifest', help="text file listing SMX files or glob patterns, one per line")
+    convert.add_argument('-o', '--out-dir', help="directory for the AVL files (default: next to each SMX file)")
+    convert.add_argument('-j', '--workers', type=int, default=None, help="number of worker processes (default: CPU count)")
+    convert.add_argument('--cache-dir', help="directory of the conversion cache (default: no cache)")
+    convert.add_argument('--cache-size', type=float, default=256, help="size limit of the conversion cache in MB (default: 256)")
+    convert.add_argument('--wing-workers', type=int, default=None,
+                         help="convert the wings of every file on this many processes, one file at a time")
+    convert.add_argument('--bodies', action='store_true', help="also write the bodies as AVL BODY blocks and BFIL files")
+    convert.add_argument('--engine', choices=ENGINES, default='fast',
+                         help="'reference' converts with the baseline algorithms, see reference.py (default: fast)")
+    convert.add_argument('--validate', choices=['errors', 'all'],
+                         help="fail files with validation errors, or with any issue (default: no validation)")
+    convert.add_argument('--profile', metavar='JSON', help="write stage timings and counters to this file ('-' for stdout)")
+    convert.add_argument('--profile-memory', action='store_true', help="also trace the memory allocated in every stage (slow)")
+
+    serve = commands.add_parser('serve', help="convert SMX documents posted to a local HTTP endpoint")
+    serve.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    serve.add_argument('--port', type=int, default=8765, help="port to listen on (default: 8765)")
+    serve.add_argument('-j', '--workers', type=int, default=None, help="number of worker processes (default: CPU count)")
+    serve.add_argument('--queue', type=int, default=16, help="requests waiting for a worker before new ones are rejected (default: 16)")
+    serve.add_argument('--cache-dir', help="directory of the conversion cache (default: no cache)")
+    serve.add_argument('--cache-size', type=float, default=256, help="size limit of the conversion cache in MB (default: 256)")
+
+    watch = commands.add_parser('watch', help="convert SMX files again whenever they are saved")
+    watch.add_argument('smx', nargs='+', help="SMX files, glob patterns or directories")
+    watch.add_argument('-o', '--out-dir', help="directory for the AVL files (default: next to each SMX file)")
+    watch.add_argument('-j', '--workers', type=int, default=None, help="number of worker threads (default: CPU count + 4, at most 32)")
+    watch.add_argument('--interval', type=float, default=0.1, help="seconds between polls of the modification times (default: 0.1)")
+    watch.add_argument('--debounce', type=float, default=0.2, help="seconds a file must be unchanged before it is converted (default: 0.2)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'watch':
+        from watch import watch, watchPatterns
+        try:
+            collectJobs(watchPatterns(args.smx), outDir=args.out_dir)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.out_dir:
+            os.makedirs(args.out_dir, exist_ok=True)
+        watch(args.smx, args.out_dir, None, args.interval, args.debounce, args.workers)
+        return 0
+
+    cache = ConversionCache(args.cache_dir, int(args.cache_size * 2**20)) if args.cache_dir else None
+
+    if args.command == 'serve':
+        from server import serve
+        serve(args.host, args.port, args.workers, args.queue, cache)
+        return 0
+
+    try:
+        jobs = collectJobs(args.smx, args.manifest, args.out_dir)
+    except ValueError as e:
+        parser.error(str(e))
+    if not jobs:
+        parser.error("no SMX files given")
+    # the stages run in the wing workers are not recorded in their profiles
+    if args.wing_workers and (args.cache_dir or args.validate or args.profile or args.engine != 'fast'):
+        parser.error("--wing-workers cannot be combined with --cache-dir, --validate, --profile or --engine")
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    profile = ('memory' if args.profile_memory else 'time') if args.profile else None
+
+    start = time.perf_counter()
+    failed = 0
+    hits = 0
+    results = list()
+    validate = {'errors': ERROR, 'all': WARNING}.get(args.validate)
+
+    params = AvlParams(bodies=args.bodies, engine=args.engine)
+
+    # with wing workers the files are converted one after the other
+    workers = 1 if args.wing_workers else args.workers
+
+    for result in convertBatch(jobs, workers, cache, profile, validate, params, args.wing_workers):
+        report(result)
+        failed += result[3] is not None
+        hits += bool(result[4])
+        results.append(result)
+
+    print(f"Converted {len(jobs) - failed} of {len(jobs)} files in {time.perf_counter() - start:.3f} s")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache: {hits} hits, {len(jobs) - failed - hits} misses, "
+              f"{stats['entries']} entries, {stats['bytes'] / 2**20:.1f} MB")
+    if profile:
+        writeProfile(profileReport(results), args.profile)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
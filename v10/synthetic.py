@@ -0,0 +1,83 @@
+import numpy as np
+from xml.etree import ElementTree as ET
+
+# ------------------- Synthetic SMX Assemblies --------------------------- #
+# Generates SMX assemblies of arbitrary size for benchmarks and checks. The
+# layout follows the Sumo files: wings with sections from tip to root,
+# control surfaces on every wing and control patterns that combine them.
+
+def NacaPoints(npoints, thickness=0.12, camber=0.02, camberPos=0.4):
+    # NACA 4-digit airfoil from the trailing edge over the upper surface to the
+    # leading edge and back over the lower surface, npoints (rounded down to odd)
+    nside = (npoints + 1) // 2
+    x = 0.5 * (1.0 - np.cos(np.linspace(0.0, np.pi, nside)))
+
+    yt = 5 * thickness * (0.2969 * np.sqrt(x) - 0.1260 * x - 0.3516 * x**2 + 0.2843 * x**3 - 0.1015 * x**4)
+    yc = np.where(x < camberPos, camber / camberPos**2 * (2 * camberPos * x - x**2),
+                  camber / (1 - camberPos)**2 * (1 - 2 * camberPos + 2 * camberPos * x - x**2))
+
+    upper = np.column_stack((x, yc + yt))[::-1]
+    lower = np.column_stack((x, yc - yt))[1:]
+    return np.concatenate((upper, lower))
+
+
+def GenerateAssembly(nwings=4, nsecs=8, npoints=70, nhinges=3, npatterns=2, nbodies=1, nframes=20, seed=0):
+    rng = np.random.default_rng(seed)
+    root = ET.Element('Assembly', sumo_version="132874")
+
+    for b in range(nbodies):
+        body = ET.SubElement(root, 'BodySkeleton', name=f"Body{b}", origin=" 0 0 0 ", rotation=" 0 0 0 ")
+        t = np.linspace(-0.5 * np.pi, 0.5 * np.pi, 7)
+        contour = '\n'.join(f" {x:.6g} {y:.6g} " for x, y in zip(np.cos(t), np.sin(t)))
+        for f in range(nframes):
+            radius = 0.1 + np.sin(np.pi * (f + 0.5) / nframes)
+            frame = ET.SubElement(body, 'BodyFrame', center=f" {f * 10.0 / nframes:.6g} 0 0 ",
+                                  height=f"{2 * radius:.6g}", name=f"Frame{f}", symmetric="true",
+                                  width=f"{2 * radius:.6g}")
+            frame.text = contour
+
+    for w in range(nwings):
+        vertical = w % 4 == 1
+        flags = "detectwinglet," if vertical else "autosym,detectwinglet,"
+        rotation = " 1.5708 0 0 " if vertical else " 0 0 0 "
+        wing = ET.SubElement(root, 'WingSkeleton', flags=flags, name=f"Wing{w}",
+                             origin=f" {3.0 * w:.6g} 0 {0.2 * w:.6g} ", rotation=rotation)
+
+        span = rng.uniform(2.0, 10.0)
+        for s in range(nsecs):
+            eta = 1.0 - s / max(nsecs - 1, 1)               # tip first
+            chord = 1.0 + 1.5 * (1.0 - eta)
+            pts = NacaPoints(npoints, thickness=rng.uniform(0.08, 0.16), camber=rng.uniform(0.0, 0.04))
+            sec = ET.SubElement(wing, 'WingSection', airfoil="NACA synthetic",
+                                center=f" {0.8 * span * eta:.6g} {span * eta:.6g} {0.05 * span * eta:.6g} ",
+                                chord=f"{chord:.6g}", dihedral="0", name=f"Wing{w}Sec{s}",
+                                twist=f"{rng.uniform(-0.02, 0.02):.6g}", yaw="0")
+            sec.text = '\n' + '\n'.join(f"{x:.6f} {y:.6f}" for x, y in pts) + '\n'
+
+    controlSys = ET.SubElement(root, 'ControlSystem')
+    surfaces = list()
+    for w in range(nwings):
+        limit = 1.0 if w % 4 == 1 else 0.5
+        name = f"Flap{w}"
+        surf = ET.SubElement(controlSys, 'ControlSrf', name=name, type="TEF", wing=f"Wing{w}")
+        for spanpos in np.sort(rng.uniform(0.02, limit - 0.02, nhinges)):
+            ET.SubElement(surf, 'Hingepoint', chordpos=f"{rng.uniform(0.65, 0.85):.3f}", spanpos=f"{spanpos:.4f}")
+        surfaces.append(name)
+
+    for p in range(npatterns if nhinges >= 2 and surfaces else 0):
+        control = ET.SubElement(controlSys, 'Control', name=f"Control{p}")
+        for name in rng.choice(surfaces, size=min(2, len(surfaces)), replace=False):
+            segment = rng.integers(0, max(nhinges - 1, 1))
+            ET.SubElement(control, 'Participation', factor=str(rng.choice([1, -1])), id=f"{name}Segment{segment}")
+
+    return root
+
+
+def GenerateSMX(**kwargs):
+    # SMX document as bytes, see GenerateAssembly for the keyword arguments
+    return b'<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(GenerateAssembly(**kwargs))
+
+
+def writeSMX(smxFile, **kwargs):
+    with open(smxFile, 'wb') as file:
+        file.write(GenerateSMX(**kwargs))
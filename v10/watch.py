@@ -0,0 +1,152 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from incremental import IncrementalConverter
+from sumo2avl import collectJobs
+from writeAVl import bodyFilePrefix
+
+# ------------------- Watch Mode ----------------------------------------- #
+# Polls the modification times of the watched SMX files from an asyncio loop
+# and reconverts a file once it has not changed for `debounce` seconds, so a
+# burst of saves gives one conversion. Conversions run on a thread pool with
+# one IncrementalConverter per file, which keeps the SURFACE blocks of the
+# unchanged wings from the previous run. At start-up, files whose AVL file is
+# missing or older are converted.
+
+def watchPatterns(patterns):
+    # patterns: SMX files, glob patterns or directories (watched for *.smx)
+    return [os.path.join(p, '*.smx') if os.path.isdir(p) else p for p in patterns]
+
+
+class Watcher:
+    def __init__(self, patterns, outDir=None, params=None, interval=0.1, debounce=0.2, workers=None):
+        self.patterns = watchPatterns(patterns)
+        self.outDir = outDir
+        self.params = params
+        self.interval = interval
+        self.debounce = debounce
+        self.pool = ThreadPoolExecutor(workers)
+
+        self.avlFiles = dict()      # smx file -> avl file
+        self.stamps = dict()        # smx file -> (mtime, size) when last seen
+        self.changed = dict()       # smx file -> time of its last change, not converted yet
+        self.running = dict()       # smx file -> conversion task
+        self.converters = dict()    # smx file -> IncrementalConverter
+        self.conversions = 0
+        self.collision = None       # last AVL file collision reported by scan
+
+    def scan(self):
+        now = time.monotonic()
+        seen = set()
+        try:
+            jobs = collectJobs(self.patterns, outDir=self.outDir)
+        except ValueError as e:
+            # a new SMX file with the name of a watched one; nothing is converted
+            # until one of them is renamed, the collision is reported once
+            if str(e) != self.collision:
+                print(f"FAILED  {e}")
+                sys.stdout.flush()
+            self.collision = str(e)
+            return
+        self.collision = None
+
+        for smxFile, avlFile in jobs:
+            try:
+                stat = os.stat(smxFile)
+            except FileNotFoundError:
+                continue
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            seen.add(smxFile)
+
+            if smxFile not in self.stamps:
+                self.avlFiles[smxFile] = avlFile
+                if not self.upToDate(avlFile, stat):
+                    self.changed[smxFile] = now - self.debounce
+            elif stamp != self.stamps[smxFile]:
+                self.changed[smxFile] = now
+            self.stamps[smxFile] = stamp
+
+        for smxFile in set(self.stamps) - seen:     # deleted files
+            for state in (self.stamps, self.changed, self.avlFiles, self.converters):
+                state.pop(smxFile, None)
+
+    def upToDate(self, avlFile, stat):
+        try:
+            return os.stat(avlFile).st_mtime_ns >= stat.st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+    def due(self):
+        # changed files that were quiet for debounce seconds and are not being converted
+        now = time.monotonic()
+        return [smxFile for smxFile, changed in self.changed.items()
+                if now - changed >= self.debounce and smxFile not in self.running]
+
+    def convertFile(self, smxFile, avlFile):
+        # runs on the pool; returns the names of the rebuilt wings
+        converter = self.converters.get(smxFile)
+        if converter is None:
+            converter = self.converters[smxFile] = IncrementalConverter(self.params)
+        shapes = dict()
+        text = converter.convert(smxFile, bodyFiles=shapes, bodyPrefix=bodyFilePrefix(avlFile))
+
+        # the BFIL files first, then the AVL file that refers to them
+        directory = os.path.dirname(os.path.abspath(avlFile))
+        for name, shape in shapes.items():
+            self.replace(os.path.join(directory, name), shape)
+        self.replace(avlFile, text)
+        return converter.rebuilt
+
+    def replace(self, path, text):
+        # replaced at once, so that AVL never reads a partial file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            file.write(text)
+        os.replace(tmp, path)
+
+    async def convert(self, smxFile):
+        avlFile = self.avlFiles[smxFile]
+        start = time.perf_counter()
+        try:
+            rebuilt = await asyncio.get_running_loop().run_in_executor(self.pool, self.convertFile, smxFile, avlFile)
+            line = (f"OK      {time.perf_counter() - start:8.3f} s  {smxFile} -> {avlFile}"
+                    f"  (rebuilt: {', '.join(rebuilt) or 'none'})")
+        except Exception as e:
+            # e.g. a file that is still being written; converted again on its next change
+            line = f"FAILED  {time.perf_counter() - start:8.3f} s  {smxFile}: {type(e).__name__}: {e}"
+        finally:
+            self.running.pop(smxFile)
+            self.conversions += 1
+        print(line)
+        sys.stdout.flush()
+
+    async def run(self, stop=None):
+        # watches until stop (an asyncio.Event) is set
+        stop = stop if stop is not None else asyncio.Event()
+        try:
+            while not stop.is_set():
+                self.scan()
+                for smxFile in self.due():
+                    del self.changed[smxFile]
+                    self.running[smxFile] = asyncio.create_task(self.convert(smxFile))
+                try:
+                    await asyncio.wait_for(stop.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            await asyncio.gather(*self.running.values())
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def watch(patterns, outDir=None, params=None, interval=0.1, debounce=0.2, workers=None):
+    watcher = Watcher(patterns, outDir, params, interval, debounce, workers)
+    print(f"Watching {', '.join(watcher.patterns)} (Ctrl-C to stop)")
+    sys.stdout.flush()
+    try:
+        asyncio.run(watcher.run())
+    except KeyboardInterrupt:
+        pass
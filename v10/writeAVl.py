@@ -1,25 +1,24 @@
+import io
+import itertools
+import os
 from xml.etree import ElementTree as ET
-from constructor import ConstructAssemblyFromXML
-from rotation import rotate, reduce
+from dataclasses import asdict, dataclass, replace
+import numpy as np
+from constructor import ConstructAssemblyFromFile, ConstructAssemblyFromXML
+from datastructure import ValidationError, WARNING
+from rotation import decimate
+import instrument
 
 def str3(value):
     return "%.3f" % value
 
-def str8(value):
-    return "%.8f" % value
+def strg(value):
+    # shortest form, no trailing .0 for whole numbers
+    return "%.15g" % value
 
 SMX_FILE = 'test2.smx'
 AVL_FILE = 'test2.avl'
 
-
-tree = ET.parse(SMX_FILE)
-root = tree.getroot()
-
-assembly = ConstructAssemblyFromXML(root)
-assembly.addControlSys()
-assembly.check()
-# assembly.plot()
-
 Mach = 0.3
 Nchord = 12
 Cspace = 1.0
@@ -27,77 +26,457 @@ Nspanwise = 26
 Sspace = -1.1
 COMPOENT = 1
 YDUPLICATE = 0
+Sref = 1260.0
+Cref = 11.0
+Bref = 113.0
+Xref = 60.0
+Yref = 0.0
+Zref = 0.0
+Nbody = 20
+Bspace = 1.0
+ENGINES = ('fast', 'reference')
 
-lines = list()
-lines.append("SUMO TO AVL GEOMETRY")
 
-lines.append("#Mach")
-lines.append(str(Mach)+'\n')
+@dataclass(frozen=True)
+class AvlParams:
+    Mach: float = Mach
+    Nchord: int = Nchord
+    Cspace: float = Cspace
+    Nspanwise: int = Nspanwise
+    Sspace: float = Sspace
+    Sref: float = Sref
+    Cref: float = Cref
+    Bref: float = Bref
+    Xref: float = Xref
+    Yref: float = Yref
+    Zref: float = Zref
+    reduceLimit: int = 600          # airfoils with this many values or more are decimated
+    airfoilPoints: int = 120        # number of points a decimated airfoil is reduced to
+    airfoilTol: float = 1e-4        # largest deviation of a decimated airfoil, in chord lengths
+    bodies: bool = False            # write BODY blocks and their BFIL files
+    Nbody: int = Nbody
+    Bspace: float = Bspace
+    engine: str = 'fast'            # 'fast', or 'reference' for the baseline algorithms, see reference.py
 
-lines.append("\t".join(['#IYsym', 'IZsym', 'Zsym']))
-lines.append("0\t0\t0\n")
+    def __post_init__(self):
+        if self.engine not in ENGINES:
+            raise ValueError(f"engine must be one of {', '.join(ENGINES)}")
 
-lines.append('\t'.join(['#Sref', 'Cref', 'Bref']))
-lines.append("1260\t11\t113\n")
 
-lines.append('\t'.join(['#Xref', 'Yref', 'Zref']))
-lines.append("60\t0\t0\n")
+# ---------------------- AVL Writer ----------------------------------- #
+class AvlWriter:
+    # Streams an AVL input file to a text stream. Blocks are separated by a
+    # newline and tab-expanded while they are written, so no copy of the
+    # whole file is ever built.
+    engine = 'fast'
 
-for wing in assembly.wingSkeletons:
+    def __init__(self, stream, params=None, started=False, bodyPrefix=''):
+        # started: the stream already holds blocks, so the first block needs a separator;
+        # bodyPrefix: prefix of the BFIL file names, see bodyFilePrefix
+        self.stream = stream
+        self.params = params if params is not None else AvlParams()
+        if self.params.engine != self.engine:
+            raise ValueError(f"{type(self).__name__} implements the {self.engine} engine, "
+                             f"not '{self.params.engine}' (see writeAVL)")
+        self.started = started
+        self.bodyPrefix = bodyPrefix
+        self.deviations = dict()    # wing###section -> max deviation of the decimated airfoil
 
-    lines.append("#====================================================================")
+    def block(self, text):
+        if self.started:
+            self.stream.write('\n')
+        self.stream.write(text.expandtabs(8))
+        self.started = True
 
-    lines.append("SURFACE")
-    lines.append(wing.name)
+    def write(self, assembly):
+        with instrument.stage('write'):
+            self.writeHeader()
+        geometry = assembly.geometry()
+        for wing, le in zip(assembly.wingSkeletons, geometry.le):
+            with instrument.stage('write', wing=wing.name):
+                self.writeSurface(wing, assembly.ctrlInfo, le)
+        if self.params.bodies:
+            self.writeBodies(assembly.bodySkeletons)
 
-    lines.append('\t'.join(['#Nchord', 'Cspace', 'Nspan', 'Sspace']))
-    lines.append(f"{Nchord}\t{Cspace}\t{Nspanwise}\t{Sspace}\n")
+    def writeHeader(self):
+        self.block("SUMO TO AVL GEOMETRY")
 
-    # lines.append(f"COMPONENT\n{COMPOENT}")
+        self.block("#Mach")
+        self.block(str(self.params.Mach)+'\n')
 
-    if 'autosym' in wing.flags:
-        lines.append(f"YDUPLICATE\n{YDUPLICATE}\n")
-    else:
-        pass
+        self.block("\t".join(['#IYsym', 'IZsym', 'Zsym']))
+        self.block("0\t0\t0\n")
+
+        p = self.params
+        self.block('\t'.join(['#Sref', 'Cref', 'Bref']))
+        self.block('\t'.join([strg(p.Sref), strg(p.Cref), strg(p.Bref)]) + '\n')
+
+        self.block('\t'.join(['#Xref', 'Yref', 'Zref']))
+        self.block('\t'.join([strg(p.Xref), strg(p.Yref), strg(p.Zref)]) + '\n')
+
+    def writeSurface(self, wing, ctrlInfo, le=None):
+        # le: rotated leading edges of the sections, see Assembly::geometry
+        self.writeSurfaceHead(wing)
+        self.writeSections(wing, ctrlInfo, le)
+
+    def writeSurfaceHead(self, wing):
+        self.block("#====================================================================")
+
+        self.block("SURFACE")
+        self.block(wing.name)
 
-    lines.append("ANGLE")
-    lines.append(str(wing.rotate[1]) + '\n')
+        self.block('\t'.join(['#Nchord', 'Cspace', 'Nspan', 'Sspace']))
+        p = self.params
+        self.block(f"{p.Nchord}\t{p.Cspace}\t{p.Nspanwise}\t{p.Sspace}\n")
 
-    lines.append("SCALE")
-    lines.append("1.0 1.0 1.0\n")
+        # self.block(f"COMPONENT\n{COMPOENT}")
 
-    lines.append("TRANSLATE")
-    lines.append('\t'.join([str(num) for num in wing.origin]) + '\n')
+        if 'autosym' in wing.flags:
+            self.block(f"YDUPLICATE\n{YDUPLICATE}\n")
 
-    for section in wing.wingSecs[::-1]:
+        self.block("ANGLE")
+        self.block(str(wing.rotate[1]) + '\n')
 
-        lines.append("#-----------------------------------------------")
+        self.block("SCALE")
+        self.block("1.0 1.0 1.0\n")
 
-        lines.append("SECTION")
-        lines.append('#' + section.name + '\n')
+        self.block("TRANSLATE")
+        self.block('\t'.join([str(num) for num in wing.origin]) + '\n')
 
-        lines.append('\t'.join(['#Xle', 'Yle', 'Zle', 'chord', 'angle', 'Nspan', 'Sspace']))
-        pos = rotate(wing.rotate, section.center)
+    def writeSections(self, wing, ctrlInfo, le=None):
+        if le is None:
+            le = wing.transform.rotate([sec.center for sec in wing.wingSecs])
+        centers = le.round(3)
+
+        for section, center in zip(wing.wingSecs[::-1], centers[::-1]):
+            key = wing.name + '###' + section.name
+            self.writeSection(section, center, ctrlInfo.get(key), key)
+
+    def writeSection(self, section, center, controls=None, key=None):
+        self.block("#-----------------------------------------------")
+
+        self.block("SECTION")
+        self.block('#' + section.name + '\n')
+
+        self.block('\t'.join(['#Xle', 'Yle', 'Zle', 'chord', 'angle', 'Nspan', 'Sspace']))
+        pos = center.tolist()
         pos.append(section.chord)
         pos.append(section.twist)
-        lines.append('\t'.join([str3(x) for x in pos]) + '\n')
+        self.block('\t'.join([str3(x) for x in pos]) + '\n')
+
+        self.writeAirfoil(self.airfoilPoints(section, key))
+        # self.block("AFIL")
+        # self.block("ag35.dat" + "\n")
+
+        if controls:
+            for info in controls:
+                self.writeControl(info)
+            self.block('')
+
+    def airfoilPoints(self, section, key=None):
+        # the airfoil as written, decimated if it is dense
+        wing = key.partition('###')[0] if key else None
+        points = section.points
+        if points.size >= self.params.reduceLimit:
+            with instrument.stage('decimate', wing=wing):
+                # at most as many values as AVL takes without decimation
+                points, deviation = decimate(points, self.params.airfoilPoints, self.params.airfoilTol,
+                                             self.params.reduceLimit // 2 - 1)
+            self.deviations[key or section.name] = deviation
+            instrument.count('decimatedPoints', len(section.points) - len(points), wing=wing)
+        instrument.count('writtenPoints', len(points), wing=wing)
+        return points
+
+    def writeAirfoil(self, points):
+        self.block("AIRFOIL")
+
+        # the coordinates go to the stream in bulk, they contain no tabs to expand
+        self.stream.write('\n')
+        np.savetxt(self.stream, points, fmt='%.8f')
+
+    def writeBodies(self, bodies):
+        for body in bodies:
+            self.writeBody(body)
+
+    def writeBody(self, body):
+        self.block("#====================================================================")
+
+        self.block("BODY")
+        self.block(body.name)
+
+        self.block('\t'.join(['#Nbody', 'Bspace']))
+        self.block(f"{self.params.Nbody}\t{self.params.Bspace}\n")
+
+        self.block("TRANSLATE")
+        self.block('\t'.join([str(num) for num in body.origin]) + '\n')
+
+        self.block("BFIL")
+        self.block(self.bodyPrefix + body.name + '.dat\n')
+
+    def writeControl(self, info):
+        self.block("CONTROL")
+        self.block('\t'.join(['#name', 'gain', 'Xhinge', 'XYZhvec', 'SgnDup']))
+        self.block('\t'.join([info.name, "1.0", str3(info.Xhinge), "0 0 0", str(info.SgnDup)]))
+
+
+def writeAVL(assembly, avlFile, params=None, bodyPrefix=None, bodyFiles=None):
+    # avlFile is a file name or a text stream, e.g. sys.stdout; with params.bodies
+    # the BFIL files are written next to a named avlFile, for a stream they go to
+    # bodyFiles (see checkBodyFiles); returns the deviations of the decimated airfoils
+    params = params if params is not None else AvlParams()
+    checkBodyFiles(params, avlFile, bodyFiles)
+    bodyPrefix = bodyPrefix if bodyPrefix is not None else bodyFilePrefix(avlFile)
+    if hasattr(avlFile, 'write'):
+        deviations = __writeAVL__(assembly, avlFile, params, bodyPrefix)
+        if params.bodies:
+            bodyFiles.update(bodyShapes(assembly, bodyPrefix))
+    else:
+        with open(avlFile, 'w') as file:
+            deviations = __writeAVL__(assembly, file, params, bodyPrefix)
+        if params.bodies:
+            writeBodyFiles(assembly, avlFile, bodyPrefix)
+
+    return deviations
+
+
+def __writeAVL__(assembly, stream, params, bodyPrefix=''):
+    Writer = AvlWriter
+    if params.engine == 'reference':
+        from reference import ReferenceWriter as Writer
+    writer = Writer(stream, params, bodyPrefix=bodyPrefix)
+    writer.write(assembly)
+    return writer.deviations
+
+
+# ---------------------- Body Shapes ---------------------------------- #
+def bodyFilePrefix(avlFile):
+    # BFIL files are named <avl name>_<body name>.dat, or <body name>.dat for streams
+    if hasattr(avlFile, 'write'):
+        return ''
+    return os.path.splitext(os.path.basename(avlFile))[0] + '_'
+
 
-        lines.append("AIRFOIL")
-        pts = [str8(pt) + '\n' if i%2==1 else str8(pt) + ' ' for i,pt in enumerate(reduce(section.points))]
-        lines.append(''.join(pts))
-        # lines.append("AFIL")
-        # lines.append("ag35.dat" + "\n")
+def checkBodyFiles(params, avlFile, bodyFiles):
+    # with params.bodies, output to a stream (or to no file at all) needs bodyFiles,
+    # a dict that receives the BFIL file name -> contents, see bodyShapes
+    if params.bodies and (avlFile is None or hasattr(avlFile, 'write')) and bodyFiles is None:
+        raise ValueError("bodies written to a stream need bodyFiles to receive the BFIL files")
 
-        key = wing.name + '###' + section.name
-        if key in assembly.ctrlInfo:
-            for info in assembly.ctrlInfo[key]:
-                lines.append("CONTROL")
-                lines.append('\t'.join(['#name', 'gain', 'Xhinge', 'XYZhvec', 'SgnDup']))
-                lines.append('\t'.join([info.name, "1.0", str3(info.Xhinge), "0 0 0", str(info.SgnDup)]))
-            lines.append('')
 
+def bodyShapes(assembly, bodyPrefix=''):
+    # BFIL file name -> contents, for all bodies
+    shapes = dict()
+    for body in assembly.bodySkeletons:
+        buffer = io.StringIO()
+        writeBodyShape(body, buffer)
+        shapes[bodyPrefix + body.name + '.dat'] = buffer.getvalue()
+    return shapes
+
+
+def writeBodyFiles(assembly, avlFile, bodyPrefix=None):
+    # the BFIL files of all bodies, in the directory of avlFile
+    directory = os.path.dirname(os.path.abspath(avlFile))
+    bodyPrefix = bodyPrefix if bodyPrefix is not None else bodyFilePrefix(avlFile)
+    for body in assembly.bodySkeletons:
+        with open(os.path.join(directory, bodyPrefix + body.name + '.dat'), 'w') as file:
+            writeBodyShape(body, file)
+
+
+def writeBodyShape(body, stream):
+    # side view of the round body with the frame areas, in the format of an airfoil
+    # file: from the tail over the top to the nose and back along the bottom
+    with instrument.stage('bodies', wing=body.name):
+        centers = body.transform.rotate(body.centers)       # the origin goes to TRANSLATE
+        top = np.column_stack((centers[:, 0], centers[:, 2] + body.radii))
+        bottom = np.column_stack((centers[:, 0], centers[:, 2] - body.radii))
+        if len(body.radii) and body.radii[0] == 0.0:         # pointed nose, listed once
+            bottom = bottom[1:]
+
+        stream.write(body.name + '\n')
+        np.savetxt(stream, np.concatenate((top[::-1], bottom)), fmt='%.8f')
+
+
+# ---------------------- Parameter Sweeps ------------------------------ #
+class AvlSweep:
+    # AVL variants of one assembly (after addControlSys) that differ only in
+    # their AvlParams. The SECTION blocks of every wing are rendered once per
+    # airfoil setting and copied into each variant, so only the header and the
+    # SURFACE lines are rendered again.
+    def __init__(self, assembly):
+        self.assembly = assembly
+        self.sections = dict()      # (reduceLimit, airfoilPoints, airfoilTol) -> SECTION blocks per wing
+        self.deviations = dict()    # (reduceLimit, airfoilPoints, airfoilTol) -> deviations, see AvlWriter
+
+    def sectionBlocks(self, params):
+        key = (params.reduceLimit, params.airfoilPoints, params.airfoilTol)
+        if key not in self.sections:
+            assembly = self.assembly
+            blocks = list()
+            deviations = dict()
+            for wing, le in zip(assembly.wingSkeletons, assembly.geometry().le):
+                buffer = io.StringIO()
+                writer = AvlWriter(buffer, params, started=True)
+                writer.writeSections(wing, assembly.ctrlInfo, le)
+                blocks.append(buffer.getvalue())
+                deviations.update(writer.deviations)
+            self.sections[key] = blocks
+            self.deviations[key] = deviations
+        return self.sections[key]
+
+    def write(self, params, avlFile, bodyFiles=None):
+        # avlFile is a file name or a text stream, bodyFiles as for writeAVL
+        checkBodyFiles(params, avlFile, bodyFiles)
+        if not hasattr(avlFile, 'write'):
+            with open(avlFile, 'w') as file:
+                self.render(params, file, bodyFilePrefix(avlFile))
+            if params.bodies:
+                writeBodyFiles(self.assembly, avlFile)
+        else:
+            self.render(params, avlFile)
+            if params.bodies:
+                bodyFiles.update(bodyShapes(self.assembly))
+
+    def render(self, params, stream, bodyPrefix=''):
+        blocks = self.sectionBlocks(params)
+        writer = AvlWriter(stream, params, bodyPrefix=bodyPrefix)
+        writer.writeHeader()
+        for wing, sections in zip(self.assembly.wingSkeletons, blocks):
+            writer.writeSurfaceHead(wing)
+            stream.write(sections)
+        if params.bodies:
+            writer.writeBodies(self.assembly.bodySkeletons)
+
+
+def sweepParams(base=None, **grid):
+    # AvlParams for every combination of the values in grid, e.g.
+    # sweepParams(Nchord=[8, 12, 16], Nspanwise=[20, 30]) gives 6 variants of base
+    base = base if base is not None else AvlParams()
+    names = list(grid)
+    return [replace(base, **dict(zip(names, values))) for values in itertools.product(*grid.values())]
+
+
+def writeSweep(assembly, variants, avlFiles):
+    # writes one AVL file per AvlParams in variants; avlFiles is a list of file
+    # names or a pattern formatted with the AvlParams fields and the variant
+    # number, e.g. 'sweep/{index:03d}_N{Nchord}.avl'; returns the file names
+    sweep = AvlSweep(assembly)
+    if isinstance(avlFiles, str):
+        avlFiles = [avlFiles.format(index=index, **asdict(params)) for index, params in enumerate(variants)]
+
+    for params, avlFile in zip(variants, avlFiles, strict=True):
+        sweep.write(params, avlFile)
+    return avlFiles
+
+
+def readAssembly(source, bodies=False):
+    # source: SMX file name, SMX document as bytes or str, binary file object,
+    # or an ElementTree / its root element; bodies: also read the BodySkeletons
+    if isinstance(source, ET.ElementTree):
+        source = source.getroot()
+    if isinstance(source, ET.Element):
+        return ConstructAssemblyFromXML(source, bodies)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return ConstructAssemblyFromFile(io.BytesIO(source), bodies)
+    if isinstance(source, str) and source.lstrip().startswith('<'):
+        return ConstructAssemblyFromFile(io.BytesIO(source.encode()), bodies)
+    if isinstance(source, (str, os.PathLike)) or hasattr(source, 'read'):
+        return ConstructAssemblyFromFile(source, bodies)
+    raise TypeError(f"cannot read an assembly from {type(source).__name__}")
+
+
+def buildAssembly(smxFile, check=False, validate=None, engine='fast', bodies=False):
+    # check: print the assembly with its issues; validate: None, or the level
+    # (ERROR or WARNING) of the issues that fail the conversion;
+    # smxFile, bodies: see readAssembly; engine: see AvlParams
+    assembly = readAssembly(smxFile, bodies)
+    assembly.addControlSys(engine=engine)
+    checkAssembly(assembly, check, validate)
+    # assembly.plot()
+
+    return assembly
+
+
+def checkAssembly(assembly, check=False, validate=None):
+    if check or validate:
+        issues = assembly.validate(validate or WARNING)
+        if check:
+            assembly.check(issues)
+        if validate and issues:
+            raise ValidationError(issues)
+
+
+def convert(source, params=None, stream=None, validate=None, bodyFiles=None):
+    # converts in memory: source as for readAssembly; returns the AVL text, or
+    # writes it to stream (and returns None) if one is given; with params.bodies
+    # the BFIL files go to the dict bodyFiles
+    params = params if params is not None else AvlParams()
+    checkBodyFiles(params, stream, bodyFiles)
+    assembly = buildAssembly(source, validate=validate, engine=params.engine, bodies=params.bodies)
+    if stream is not None:
+        writeAVL(assembly, stream, params, bodyFiles=bodyFiles)
+        return None
+
+    buffer = io.StringIO()
+    writeAVL(assembly, buffer, params, bodyFiles=bodyFiles)
+    return buffer.getvalue()
+
+
+def convertSMX(smxFile, avlFile, check=False, params=None, cache=None, validate=None, bodyFiles=None):
+    # returns whether the AVL text came from the cache (None without a cache);
+    # bodyFiles as for writeAVL
+    params = params if params is not None else AvlParams()
+    checkBodyFiles(params, avlFile, bodyFiles)
+    if cache is None:
+        writeAVL(buildAssembly(smxFile, check, validate, params.engine, params.bodies), avlFile, params,
+                 bodyFiles=bodyFiles)
+        return None
+
+    with open(smxFile, 'rb') as file:
+        smxData = file.read()
+
+    # entries are only valid for the validation level they passed, and
+    # with bodies for the AVL file name the BFIL files are named after
+    bodyPrefix = bodyFilePrefix(avlFile)
+    variant = params
+    if validate:
+        variant = (variant, validate)
+    if params.bodies:
+        variant = (variant, bodyPrefix)
+    key = cache.key(smxData, variant)
+    text = cache.get(key)
+    hit = text is not None
+
+    # the assembly of the SMX data may be cached from a conversion with other parameters
+    assemblyKey = cache.assemblyKey(smxData, params.engine, params.bodies)
+    assembly = None
+    if not hit:
+        assembly = cache.getAssembly(assemblyKey)
+        if assembly is None:
+            assembly = buildAssembly(io.BytesIO(smxData), engine=params.engine, bodies=params.bodies)
+            cache.putAssembly(assemblyKey, assembly)
+        checkAssembly(assembly, check, validate)
+
+        buffer = io.StringIO()
+        __writeAVL__(assembly, buffer, params, bodyPrefix)
+        text = buffer.getvalue()
+        cache.put(key, text)
+
+    if hasattr(avlFile, 'write'):
+        avlFile.write(text)
+    else:
+        with open(avlFile, 'w') as file:
+            file.write(text)
+
+    if params.bodies:
+        if assembly is None:
+            assembly = cache.getAssembly(assemblyKey) or buildAssembly(io.BytesIO(smxData), engine=params.engine, bodies=params.bodies)
+        if hasattr(avlFile, 'write'):
+            bodyFiles.update(bodyShapes(assembly, bodyPrefix))
+        else:
+            writeBodyFiles(assembly, avlFile, bodyPrefix)
 
-with open(AVL_FILE, 'w') as file:
-    file.write("\n".join(lines).expandtabs(8))
+    return hit
 
 
+if __name__ == '__main__':
+    convertSMX(SMX_FILE, AVL_FILE, check=True)